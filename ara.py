@@ -0,0 +1,181 @@
+"""
+This file contains Anytime Repairing A* (ARA*), which returns a first path quickly with an inflated heuristic and
+improves it while the time budget lasts, reusing the costs found by the previous searches.
+"""
+from collections.abc import Iterator
+import math
+import time
+from typing import Optional
+
+import numpy as np
+
+from grid import GridGraph
+from node import Position
+from openlist import OpenList
+from search_stats import SearchStats
+import utils as util
+
+# Weight of the heuristic of the first search, and how much it decreases after every path
+ARA_WEIGHT = 3.0
+ARA_WEIGHT_STEP = 0.5
+# Seconds Planner.plan_anytime keeps improving the path by default
+ARA_TIME_BUDGET = 0.1
+# Expansions ara_star spends improving the first path when it is run by name, a budget that does not depend on
+# the load of the machine so the same query always returns the same path, e.g. for the plan cache and the benchmark
+ARA_EXPANSION_BUDGET = 10000
+
+
+def _lower_bound(graph: GridGraph, cells: list[int]) -> float:
+    """
+    return: the lowest g + h of the cells, a lower bound of the cost of the shortest path while they hold every
+    cell whose cost can still decrease
+    """
+    if not cells:
+        return math.inf
+    indices = np.array(cells, dtype=np.intp)
+    if graph.h is None:
+        heuristic = np.array([graph.heuristic(index) for index in cells])
+    else:
+        heuristic = graph.h[indices]
+    return float(np.min(graph.g[indices] + heuristic))
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def _improve_path(
+    graph: GridGraph,
+    open_list: OpenList,
+    closed: set[int],
+    inconsistent: set[int],
+    weight: float,
+    deadline: float,
+    depth: int,
+    depth_limit: int,
+    stats: Optional[SearchStats],
+) -> int:
+    """
+    One search of ARA*, which stops once the path to the goal is no worse than the best priority of the open
+    list, at the deadline or at the depth limit.
+
+    return: the depth the search stopped at
+    """
+    while open_list and graph.cost(graph.goal_index) > open_list.peek() and depth < depth_limit:
+        if time.perf_counter() >= deadline:
+            break
+        depth += 1
+        current_index = open_list.pop()
+        closed.add(current_index)
+
+        if stats is None:
+            neighbors = graph.neighbors(current_index)
+        else:
+            neighbors = stats.expand(current_index, graph.neighbors, len(open_list))
+        for neighbor, move_weight in neighbors:
+            cost = graph.g[current_index] + graph.cost_addition * move_weight
+            if cost < graph.cost(neighbor):
+                graph.set_cost(neighbor, cost, current_index)
+                # Expanded cells are not expanded again by this search, they seed the next one
+                if neighbor in closed:
+                    inconsistent.add(neighbor)
+                else:
+                    open_list.push(neighbor, cost + weight * graph.heuristic(neighbor))
+    return depth
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+def anytime_a_star(
+    graph: GridGraph,
+    start: Position,
+    time_budget: float = ARA_TIME_BUDGET,
+    weight: float = ARA_WEIGHT,
+    weight_step: float = ARA_WEIGHT_STEP,
+    depth_limit: int = 1000000,
+    stats: Optional[SearchStats] = None,
+    improve_limit: Optional[int] = None,
+) -> Iterator[tuple[list[Position], float]]:
+    """
+    ARA* (Likhachev, Gordon and Thrun). Every search is A* with the heuristic multiplied by the weight, so its
+    path costs at most weight times the shortest one. The cells whose cost decreased after they were expanded
+    are kept aside and, with the open list, seed the next search with a lower weight instead of starting over.
+    The bound of a path is the lower of the weight and its cost over the lowest g + h of those cells, so it can
+    be proven optimal before the weight reaches 1. The bounds hold for admissible heuristics.
+
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
+    :param time_budget: seconds after which the search stops, even in the middle of a search
+    :param weight: the weight of the heuristic of the first search, at least 1
+    :param weight_step: how much the weight decreases after every search
+    :param depth_limit: the number of expansions of all the searches together
+    :param stats: the counters to fill in, the search is not instrumented without them
+    :param improve_limit: the number of expansions spent improving the path once the first one is found, within
+        the depth limit, unlimited without it
+    :return: generator of every path found, each better than the last, with its suboptimality bound
+    """
+    deadline = time.perf_counter() + time_budget
+    open_list = OpenList()
+    start_index = graph.index(start)
+    graph.set_cost(start_index, 0, -1)
+    open_list.push(start_index, weight * graph.heuristic(start_index))
+    depth = 0
+    # Cells expanded by the current search, and those whose cost decreased after it
+    closed: set[int] = set()
+    inconsistent: set[int] = set()
+    # Weight of the last search that was not interrupted, which bounds the cost of the path
+    proven_weight = math.inf
+    # Cost and bound of the last path returned, a lower weight can find the same path again
+    best = (math.inf, math.inf)
+    found = False
+    # Expansions the current search can reach, lowered to the improvement budget once a path is found
+    limit = depth_limit
+
+    while True:
+        depth = _improve_path(graph, open_list, closed, inconsistent, weight, deadline, depth, limit, stats)
+        goal_cost = graph.cost(graph.goal_index)
+        interrupted = time.perf_counter() >= deadline or depth >= limit
+        if not interrupted:
+            proven_weight = weight
+        if goal_cost == math.inf:
+            break
+        if not found and improve_limit is not None:
+            limit = min(depth_limit, depth + improve_limit)
+        found = True
+        # Every cell whose cost is not final yet is reached from one of them, so the bound holds at any time
+        lower = _lower_bound(graph, [*open_list.entries, *inconsistent])
+        bound = 1.0 if goal_cost <= lower else min(proven_weight, goal_cost / lower)
+        if (goal_cost, bound) < best:
+            best = (goal_cost, bound)
+            yield util.backtrack(graph, graph.goal_index, start), bound
+        if interrupted or bound <= 1:
+            break
+
+        # The next search has a lower weight, and starts from the open and inconsistent cells
+        weight = max(1.0, weight - weight_step)
+        if stats is not None:
+            stats.record(open_list, depth, depth_limit, found)
+        seeds = [*open_list.entries, *inconsistent]
+        open_list = OpenList()
+        for index in seeds:
+            open_list.push(index, graph.g[index] + weight * graph.heuristic(index))
+        closed.clear()
+        inconsistent.clear()
+
+    if stats is not None:
+        stats.record(open_list, depth, depth_limit, found)
+
+
+def ara_star(
+    graph: GridGraph, start: Position, depth_limit: int = 1000000, stats: Optional[SearchStats] = None
+) -> list[Position]:
+    """
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
+    :param depth_limit: the number of expansions of all the searches together
+    :param stats: the counters to fill in, the search is not instrumented without them
+    Returns: the first path, improved for at most ARA_EXPANSION_BUDGET more expansions, empty if none is found
+        within the depth limit
+    """
+    path: list[Position] = []
+    for path, _ in anytime_a_star(
+        graph, start, math.inf, depth_limit=depth_limit, stats=stats, improve_limit=ARA_EXPANSION_BUDGET
+    ):
+        pass
+    return path
@@ -0,0 +1,171 @@
+"""
+This file contains the batch planner, which splits many (start, goal) queries on one map across a pool of
+processes that share the map through shared memory.
+"""
+from dataclasses import dataclass
+from multiprocessing import Pool, shared_memory
+import os
+import time
+from typing import Any, Iterator, Optional, Sequence, TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+from node import Position
+from planner import Planner
+
+Query: TypeAlias = tuple[Position, Position]
+
+# State of a worker process, set once by _attach when the process starts
+# pylint: disable=invalid-name
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+_worker_planner: Optional[Planner] = None
+
+
+@dataclass
+class BatchReport:
+    """
+    Throughput of a batch of queries.
+    """
+    processes: int
+    queries: int = 0
+    seconds: float = 0.0
+    paths_found: int = 0
+
+    @property
+    def queries_per_second(self) -> float:
+        """
+        return: the number of queries answered per second
+        """
+        return self.queries / self.seconds if self.seconds else 0.0
+
+    @property
+    def queries_per_second_per_core(self) -> float:
+        """
+        return: the number of queries answered per second by each process
+        """
+        return self.queries_per_second / self.processes
+
+
+def _attach(name: str, shape: tuple[int, int], dtype: str) -> None:
+    """
+    Pool initializer, attaches the worker to the published map without copying it.
+    """
+    # pylint: disable=global-statement
+    global _worker_memory, _worker_planner
+    # The pool shares the resource tracker of the parent, which owns the block and unlinks it
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    norm_map: npt.NDArray[Any] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_worker_memory.buf)
+    _worker_planner = Planner(norm_map)
+
+
+def _plan_chunk(
+    task: tuple[list[tuple[int, Position, Position]], str, str, bool, int]
+) -> list[tuple[int, list[Position]]]:
+    """
+    Plans a chunk of numbered queries in a worker.
+    """
+    chunk, algorithm, heuristic, diagonal, depth_limit = task
+    assert _worker_planner is not None
+    return [
+        (number, _worker_planner.plan(start, goal, algorithm, heuristic, diagonal, depth_limit))
+        for number, start, goal in chunk
+    ]
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+def plan_batch(
+    norm_map: npt.NDArray[Any],
+    queries: Sequence[Query],
+    algorithm: str = 'a_star',
+    heuristic: str = 'manhattan',
+    diagonal: bool = False,
+    depth_limit: int = 1000000,
+    processes: Optional[int] = None,
+    chunk_size: int = 16,
+    report: Optional[BatchReport] = None,
+) -> Iterator[tuple[int, list[Position]]]:
+    """
+    Plans every (start, goal) query on the map with a pool of processes.
+
+    The map is copied once into shared memory and every worker plans on a view of it, so it is never
+    pickled. Results are yielded as the chunks complete, not in the order of the queries.
+
+    Parameters
+    ----------
+    norm_map : numpy.ndarray
+        2D map where obstacles are 1 and free space is 0, e.g. GridMap.norm_map
+    queries : Sequence[Query]
+        (start, goal) pairs of (row, column) cells
+    algorithm, heuristic, diagonal, depth_limit :
+        see Planner.plan
+    processes : int, optional
+        number of worker processes, the number of CPUs by default
+    chunk_size : int, optional
+        number of queries sent to a worker at once
+    report : BatchReport, optional
+        filled with the throughput of the batch once every query is answered
+
+    Yields
+    ------
+    tuple[int, list[Position]]
+        the index of the query and its path, empty if no path is found
+    """
+    processes = processes or os.cpu_count() or 1
+    tasks = [
+        (
+            [(number, query[0], query[1]) for number, query in enumerate(queries[i:i + chunk_size], i)],
+            algorithm,
+            heuristic,
+            diagonal,
+            depth_limit,
+        )
+        for i in range(0, len(queries), chunk_size)
+    ]
+
+    memory = shared_memory.SharedMemory(create=True, size=max(1, norm_map.nbytes))
+    try:
+        np.ndarray(norm_map.shape, dtype=norm_map.dtype, buffer=memory.buf)[:] = norm_map
+
+        start_time = time.perf_counter()
+        with Pool(processes, _attach, (memory.name, norm_map.shape, norm_map.dtype.str)) as pool:
+            for results in pool.imap_unordered(_plan_chunk, tasks):
+                for number, path in results:
+                    if report is not None:
+                        report.queries += 1
+                        report.paths_found += bool(path)
+                    yield number, path
+        if report is not None:
+            report.processes = processes
+            report.seconds = time.perf_counter() - start_time
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def measure_throughput(
+    norm_map: npt.NDArray[Any],
+    queries: Sequence[Query],
+    process_counts: Sequence[int] = (1, 2, 4),
+    **plan_arguments: Any,
+) -> list[BatchReport]:
+    """
+    Runs the same batch with every number of processes.
+
+    :param norm_map: 2D map where obstacles are 1 and free space is 0
+    :param queries: (start, goal) pairs of (row, column) cells
+    :param process_counts: numbers of processes to try
+    :param plan_arguments: other arguments of plan_batch
+    :return: the report of every run
+    """
+    reports = []
+    for processes in process_counts:
+        report = BatchReport(processes)
+        for _ in plan_batch(norm_map, queries, processes=processes, report=report, **plan_arguments):
+            pass
+        reports.append(report)
+        print(
+            f"{processes} processes: {report.queries_per_second:.1f} queries/s, "
+            f"{report.queries_per_second_per_core:.1f} queries/s per core"
+        )
+    return reports
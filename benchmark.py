@@ -0,0 +1,399 @@
+"""
+This file contains the planner benchmark, which sweeps the search algorithms, heuristics and connectivities over
+synthetic maps of several kinds and sizes and writes the results as JSON.
+
+The timing pass runs without tracemalloc, which slows every allocation of the search, and the memory pass runs
+each query once with it. The caches of the planner and the heuristic fields are cleared before every timed run,
+and the latency of a query planned again right after is reported as the warm latency. Compare two result files
+with --compare to see the change between two commits.
+
+Usage: python benchmark.py --sizes 64 128 --output results.json [--compare baseline.json]
+"""
+import argparse
+from dataclasses import asdict, dataclass, field
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Any, Callable, Optional, Sequence, TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+from distance_field import compute_distance_field
+from grid import DIAGONAL_WEIGHT, STRAIGHT_WEIGHT, GridGraph
+from heuristic import HEURISTICS, clear_fields
+from node import Position
+from planner import Planner
+from search_stats import SearchStats
+
+MapGenerator: TypeAlias = Callable[[int, np.random.Generator], npt.NDArray[np.int64]]
+Query: TypeAlias = tuple[Position, Position, float]
+
+DEFAULT_ALGORITHMS = ['a_star', 'greedy_first', 'beam', 'djikstra']
+# Algorithms that ignore the heuristic are only run once per connectivity
+NO_HEURISTIC = {'djikstra', 'bidirectional_djikstra', 'distance_field'}
+
+
+def random_map(size: int, rng: np.random.Generator, density: float = 0.25) -> npt.NDArray[np.int64]:
+    """
+    return: a map where every cell is an obstacle with the probability density
+    """
+    return (rng.random((size, size)) < density).astype(np.int64)
+
+
+def maze_map(size: int, rng: np.random.Generator) -> npt.NDArray[np.int64]:
+    """
+    return: a perfect maze with corridors one cell wide, carved by a randomized depth first search
+    """
+    grid = np.ones((size, size), dtype=np.int64)
+    cells = (size - 1) // 2
+    stack = [(0, 0)]
+    grid[1, 1] = 0
+    while stack:
+        row, col = stack[-1]
+        options = [
+            (row + d_row, col + d_col) for d_row, d_col in ((0, 1), (1, 0), (0, -1), (-1, 0))
+            if 0 <= row + d_row < cells and 0 <= col + d_col < cells
+            and grid[2 * (row + d_row) + 1, 2 * (col + d_col) + 1]
+        ]
+        if not options:
+            stack.pop()
+            continue
+        next_row, next_col = options[rng.integers(len(options))]
+        grid[row + next_row + 1, col + next_col + 1] = 0
+        grid[2 * next_row + 1, 2 * next_col + 1] = 0
+        stack.append((next_row, next_col))
+    return grid
+
+
+def corridor_map(size: int, rng: np.random.Generator, spacing: int = 6) -> npt.NDArray[np.int64]:
+    """
+    return: a map of horizontal walls with a gap at alternating ends, which makes one long winding corridor
+    """
+    grid = np.zeros((size, size), dtype=np.int64)
+    for number, row in enumerate(range(spacing, size - 1, spacing)):
+        grid[row] = 1
+        gap = int(rng.integers(1, spacing))
+        if number % 2:
+            grid[row, :gap] = 0
+        else:
+            grid[row, size - gap:] = 0
+    return grid
+
+
+def rooms_map(size: int, rng: np.random.Generator, room_size: int = 16) -> npt.NDArray[np.int64]:
+    """
+    return: a map of square rooms with a door in every wall between two rooms
+    """
+    grid = np.zeros((size, size), dtype=np.int64)
+    room_size = min(room_size, max(4, size // 2))
+    for line in range(room_size, size - 1, room_size):
+        grid[line] = 1
+        grid[:, line] = 1
+    for line in range(room_size, size - 1, room_size):
+        for begin in range(0, size, room_size):
+            width = min(room_size, size - begin) - 1
+            if width < 2:
+                continue
+            door = begin + int(rng.integers(0, width - 1))
+            grid[line, door:door + 2] = 0
+            door = begin + int(rng.integers(0, width - 1))
+            grid[door:door + 2, line] = 0
+    return grid
+
+
+MAP_GENERATORS: dict[str, MapGenerator] = {
+    'random': random_map,
+    'maze': maze_map,
+    'corridors': corridor_map,
+    'rooms': rooms_map,
+}
+
+
+def path_cost(start: Position, path: Sequence[Position]) -> float:
+    """
+    return: the cost of the path from the start with the weights of GridGraph, infinity if it is empty. The
+        waypoints of any-angle paths are joined by the straight and diagonal moves of their Bresenham lines.
+    """
+    if not path:
+        return float('inf')
+    cells = np.array([start, *path])
+    steps = np.abs(np.diff(cells, axis=0))
+    diagonal = steps.min(axis=1)
+    return float((diagonal * DIAGONAL_WEIGHT + (steps.max(axis=1) - diagonal) * STRAIGHT_WEIGHT).sum())
+
+
+def make_queries(
+    norm_map: npt.NDArray[Any], count: int, diagonal: bool, rng: np.random.Generator
+) -> list[Query]:
+    """
+    Draws (start, goal) pairs of connected free cells, with the cost of the shortest path between them.
+    """
+    free = np.argwhere(norm_map == 0)
+    queries: list[Query] = []
+    for _ in range(20 * count):
+        if len(queries) == count or len(free) < 2:
+            break
+        goal = tuple(int(value) for value in free[rng.integers(len(free))])
+        distance_field = compute_distance_field(GridGraph(norm_map), (goal[0], goal[1]), diagonal)
+        reachable = np.flatnonzero(np.isfinite(distance_field.distance))
+        if reachable.size < 2:
+            continue
+        start = divmod(int(reachable[rng.integers(reachable.size)]), norm_map.shape[1])
+        if start != goal:
+            queries.append((start, (goal[0], goal[1]), distance_field.cost(start)))
+    return queries
+
+
+@dataclass
+class BenchmarkResult:
+    """
+    Measurements of one configuration over the queries of one map kind and size.
+    """
+    # pylint: disable=too-many-instance-attributes
+    map_kind: str
+    size: int
+    algorithm: str
+    heuristic: str
+    diagonal: bool
+    queries: int = 0
+    paths_found: int = 0
+    median_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    # Latency of a query planned again right after, which distance_field, hpa and pyramid answer from their caches
+    warm_median_ms: Optional[float] = None
+    peak_kib: Optional[float] = None
+    median_expansions: Optional[float] = None
+    mean_cost_ratio: Optional[float] = None
+    max_cost_ratio: Optional[float] = None
+    latencies_ms: list[float] = field(default_factory=list, repr=False)
+    warm_latencies_ms: list[float] = field(default_factory=list, repr=False)
+
+    @property
+    def key(self) -> str:
+        """
+        return: the name of the configuration, the same across result files
+        """
+        return f"{self.map_kind}/{self.size}/{self.algorithm}/{self.heuristic}/{'8' if self.diagonal else '4'}"
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def time_configuration(
+    planner: Planner,
+    queries: Sequence[Query],
+    result: BenchmarkResult,
+    repeats: int = 3,
+    depth_limit: int = 1000000,
+) -> None:
+    """
+    Timing pass, plans every query repeats times and records the latencies, expansions and path costs. The
+    caches of the planner are cleared before every timed run, so the latencies include building the distance
+    field, hierarchical graph or pyramid, and one more run of every query records the warm latency.
+    """
+    expansions = []
+    ratios = []
+    for start, goal, optimal in queries:
+        for repeat in range(repeats):
+            # The timed runs are not instrumented, the stats are gathered by an extra run
+            planner.clear_caches()
+            clear_fields()
+            begin = time.perf_counter_ns()
+            path = planner.plan(start, goal, result.algorithm, result.heuristic, result.diagonal, depth_limit)
+            result.latencies_ms.append((time.perf_counter_ns() - begin) / 10 ** 6)
+            if repeat == 0:
+                stats = SearchStats()
+                planner.plan(start, goal, result.algorithm, result.heuristic, result.diagonal, depth_limit, stats)
+                result.queries += 1
+                expansions.append(stats.expansions)
+                if path:
+                    result.paths_found += 1
+                    ratios.append(path_cost(start, path) / optimal)
+
+        begin = time.perf_counter_ns()
+        planner.plan(start, goal, result.algorithm, result.heuristic, result.diagonal, depth_limit)
+        result.warm_latencies_ms.append((time.perf_counter_ns() - begin) / 10 ** 6)
+
+    if result.latencies_ms:
+        result.median_ms = float(np.median(result.latencies_ms))
+        result.p95_ms = float(np.percentile(result.latencies_ms, 95))
+        result.median_expansions = float(np.median(expansions))
+        result.warm_median_ms = float(np.median(result.warm_latencies_ms))
+    if ratios:
+        result.mean_cost_ratio = float(np.mean(ratios))
+        result.max_cost_ratio = float(np.max(ratios))
+
+
+def measure_memory(
+    planner: Planner, queries: Sequence[Query], result: BenchmarkResult, depth_limit: int = 1000000
+) -> None:
+    """
+    Memory pass, plans every query once under tracemalloc and records the highest peak. The arrays of the
+    graph are allocated with the planner, so the peak is what a search allocates on top of them, including the
+    caches it builds since they are cleared first.
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for start, goal, _ in queries:
+            planner.clear_caches()
+            clear_fields()
+            tracemalloc.reset_peak()
+            planner.plan(start, goal, result.algorithm, result.heuristic, result.diagonal, depth_limit)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    if peaks:
+        result.peak_kib = max(peaks) / 1024
+
+
+def configurations(algorithms: Sequence[str], heuristics: Sequence[str]) -> list[tuple[str, str]]:
+    """
+    return: the (algorithm, heuristic) pairs of the sweep
+    """
+    return [
+        (algorithm, heuristic)
+        for algorithm in algorithms
+        for heuristic in ([heuristics[0]] if algorithm in NO_HEURISTIC else heuristics)
+    ]
+
+
+# pylint: disable=too-many-locals
+def run_benchmark(
+    sizes: Sequence[int] = (32, 64, 128),
+    map_kinds: Sequence[str] = tuple(MAP_GENERATORS),
+    algorithms: Sequence[str] = tuple(DEFAULT_ALGORITHMS),
+    heuristics: Sequence[str] = tuple(HEURISTICS),
+    connectivities: Sequence[bool] = (False, True),
+    queries_per_map: int = 5,
+    repeats: int = 3,
+    memory: bool = True,
+    seed: int = 0,
+) -> list[BenchmarkResult]:
+    """
+    Runs the sweep, one map per kind and size shared by every configuration.
+
+    :param sizes: numbers of rows and columns of the maps
+    :param map_kinds: names of the map generators, see MAP_GENERATORS
+    :param algorithms: names of the algorithms, see planner.ALGORITHM_NAMES
+    :param heuristics: names of the heuristics, see heuristic.HEURISTICS
+    :param connectivities: whether diagonal neighbors are allowed, for every run
+    :param queries_per_map: number of (start, goal) queries
+    :param repeats: number of timed runs of every query
+    :param memory: whether to run the memory pass after the timing pass
+    :param seed: seed of the maps and of the queries
+    :return: the result of every configuration
+    """
+    results = []
+    for map_kind in map_kinds:
+        for size in sizes:
+            rng = np.random.default_rng(seed)
+            norm_map = MAP_GENERATORS[map_kind](size, rng)
+            planner = Planner(norm_map)
+            for diagonal in connectivities:
+                queries = make_queries(norm_map, queries_per_map, diagonal, rng)
+                for algorithm, heuristic in configurations(algorithms, heuristics):
+                    result = BenchmarkResult(map_kind, size, algorithm, heuristic, diagonal)
+                    time_configuration(planner, queries, result, repeats)
+                    if memory:
+                        measure_memory(planner, queries, result)
+                    results.append(result)
+                    print(
+                        f"{result.key}: median {result.median_ms} ms, p95 {result.p95_ms} ms, "
+                        f"warm {result.warm_median_ms} ms, "
+                        f"{result.paths_found}/{result.queries} found, cost ratio {result.mean_cost_ratio}"
+                    )
+    return results
+
+
+def environment() -> dict[str, Any]:
+    """
+    return: the commit and the versions the benchmark ran with
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def write_results(path: str, results: Sequence[BenchmarkResult], settings: dict[str, Any]) -> None:
+    """
+    Writes the results, the settings of the run and its environment to a JSON file.
+    """
+    document = {
+        'environment': environment(),
+        'settings': settings,
+        'results': [{'key': result.key, **asdict(result)} for result in results],
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(document, file, indent=1)
+
+
+def compare(baseline_path: str, results_path: str) -> dict[str, float]:
+    """
+    Prints the ratio of the median latencies of the configurations found in both files.
+
+    :return: the ratio of every common configuration, new over baseline
+    """
+    medians = []
+    for path in (baseline_path, results_path):
+        with open(path, encoding='utf-8') as file:
+            medians.append({entry['key']: entry['median_ms'] for entry in json.load(file)['results']})
+    ratios = {
+        key: medians[1][key] / medians[0][key]
+        for key in sorted(medians[0].keys() & medians[1].keys())
+        if medians[0][key] and medians[1][key] is not None
+    }
+    for key, ratio in ratios.items():
+        print(f"{key}: {ratio:.2f}x")
+    return ratios
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--maps', nargs='+', default=list(MAP_GENERATORS), choices=list(MAP_GENERATORS))
+    parser.add_argument('--algorithms', nargs='+', default=DEFAULT_ALGORITHMS)
+    parser.add_argument('--heuristics', nargs='+', default=list(HEURISTICS), choices=list(HEURISTICS))
+    parser.add_argument('--connectivity', type=int, nargs='+', default=[4, 8], choices=[4, 8])
+    parser.add_argument('--queries', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    arguments = parser.parse_args()
+
+    results = run_benchmark(
+        arguments.sizes,
+        arguments.maps,
+        arguments.algorithms,
+        arguments.heuristics,
+        [connectivity == 8 for connectivity in arguments.connectivity],
+        arguments.queries,
+        arguments.repeats,
+        not arguments.no_memory,
+        arguments.seed,
+    )
+    write_results(arguments.output, results, {
+        key: value for key, value in vars(arguments).items() if key not in ('output', 'compare')
+    })
+    if arguments.compare:
+        compare(arguments.compare, arguments.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+This file contains the bidirectional versions of A* and Djikstra, which search from the start and from the goal
+at the same time until the two frontiers meet.
+"""
+import math
+from typing import Optional
+
+from grid import GridGraph
+from node import Position
+from openlist import OpenList
+from search_stats import SearchStats
+import utils as util
+
+
+def _meeting_path(forward: GridGraph, backward: GridGraph, meeting: int, start: Position) -> list[Position]:
+    """
+    return: the path from the start (excluded) through the meeting cell to the goal
+    """
+    path = util.backtrack(forward, meeting, start)
+    index = meeting
+    while index != forward.goal_index:
+        index = int(backward.parent[index])
+        path.append(forward.position(index))
+    return path
+
+
+def _potential(this: GridGraph, other: GridGraph, index: int) -> float:
+    """
+    return: the average potential of the cell for the search on this, half the difference of the heuristic
+    towards the goal of this search and the heuristic towards the goal of the other search
+    """
+    return (this.heuristic(index) - other.heuristic(index)) / 2
+
+
+# pylint: disable=too-many-locals,too-many-branches
+def _bidirectional(
+    graph: GridGraph, start: Position, depth_limit: int, stats: Optional[SearchStats], use_heuristic: bool
+) -> list[Position]:
+    """
+    Runs the forward search on graph and the backward search on its reverse graph, expanding the side with the
+    smaller open list. best is the cost of the cheapest path through a cell reached by both searches.
+
+    The priority of a cell is its g-cost plus its potential, which is 0 for Djikstra and the average potential
+    for A*. The potentials of the two directions cancel out, so the reduced edge costs are the same in both
+    directions and the search stops as bidirectional Djikstra does, once the sum of the two lowest
+    priorities reaches best. Heuristics have to be consistent for the A* version to be optimal.
+    """
+    if graph.index(start) == graph.goal_index:
+        return []
+
+    backward = graph.reverse(start)
+    forward_open = OpenList()
+    backward_open = OpenList()
+    cost_addition = graph.cost_addition if use_heuristic else 1
+
+    for this, other, this_open, index in (
+        (graph, backward, forward_open, graph.index(start)),
+        (backward, graph, backward_open, graph.goal_index),
+    ):
+        this.set_cost(index, 0, -1)
+        this.f[index] = _potential(this, other, index) if use_heuristic else 0
+        this_open.push(index, this.f[index])
+
+    best = math.inf
+    meeting = -1
+    depth = 0
+
+    while forward_open and backward_open and depth < depth_limit:
+        if forward_open.peek() + backward_open.peek() >= best:
+            break
+        depth += 1
+
+        if len(forward_open) <= len(backward_open):
+            this, other, this_open = graph, backward, forward_open
+        else:
+            this, other, this_open = backward, graph, backward_open
+
+        current_index = this_open.pop()
+        this.mark_visited(current_index)
+
+        if stats is None:
+            neighbors = this.neighbors(current_index)
+        else:
+            neighbors = stats.expand(current_index, this.neighbors, len(this_open))
+        for neighbor, weight in neighbors:
+            cost = this.g[current_index] + cost_addition * weight
+            if cost < this.cost(neighbor):
+                this.set_cost(neighbor, cost, current_index)
+                this.f[neighbor] = cost + (_potential(this, other, neighbor) if use_heuristic else 0)
+                this_open.push(neighbor, this.f[neighbor])
+
+            total = this.cost(neighbor) + other.cost(neighbor)
+            if total < best:
+                best = total
+                meeting = neighbor
+
+    if stats is not None:
+        stats.record(forward_open, depth, depth_limit, meeting >= 0)
+        stats.record(backward_open, depth, depth_limit, meeting >= 0)
+    if meeting < 0:
+        return []
+    return _meeting_path(graph, backward, meeting, start)
+
+
+def bidirectional_a_star(
+    graph: GridGraph, start: Position, depth_limit: int = 50, stats: Optional[SearchStats] = None
+) -> list[Position]:
+    """
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
+    :param depth_limit: the depth limit of the search, counting the expansions of both directions
+    :param stats: the counters to fill in for both directions, the search is not instrumented without them
+    Returns: a list of nodes that represents the path from the start node to the end node
+    """
+    return _bidirectional(graph, start, depth_limit, stats, use_heuristic=True)
+
+
+def bidirectional_djikstra(
+    graph: GridGraph, start: Position, depth_limit: int = 10000, stats: Optional[SearchStats] = None
+) -> list[Position]:
+    """
+    :param graph: Grid to search, prepared for the goal with GridGraph.reset
+    :param start: Start position to run djikstra with
+    :param depth_limit: Number of iterations to allow djikstra to run, counting both directions
+    :param stats: Counters to fill in for both directions, the search is not instrumented without them
+    Returns a list of Positions of the path if possible
+    """
+    return _bidirectional(graph, start, depth_limit, stats, use_heuristic=False)
@@ -0,0 +1,92 @@
+"""
+This file contains the optimality check, which plans on small random maps with every algorithm that should return
+a shortest path and compares the cost of its paths with djikstra. It exits with status 1 when a path is longer,
+so CI runs it on every push.
+
+Usage: python check_optimality.py [--trials 200] [--seed 0]
+"""
+import argparse
+import sys
+from typing import Iterator, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from benchmark import configurations, path_cost, random_map
+from node import Position
+from planner import Planner
+
+# Algorithms that return a shortest path with an admissible heuristic
+OPTIMAL_ALGORITHMS = ['a_star', 'jps', 'bidirectional_a_star', 'bidirectional_djikstra', 'distance_field', 'wavefront']
+ADMISSIBLE_HEURISTICS = ['manhattan', 'euclidean', 'chebyshev', 'octile']
+# Trials of optimality_cases with seed 0 that found a bug, checked by every run with that seed. On 1194, JPS
+# returned no path because a cell kept a straight parent reached at the same cost as a diagonal one
+REGRESSIONS = [1194]
+
+
+def optimality_cases(trials: int, seed: int = 0) -> Iterator[tuple[int, npt.NDArray[np.int64], Position, Position]]:
+    """
+    return: generator of the (trial, map, start, goal) of small random maps, 5 to 30 cells wide with 30% obstacles
+    """
+    rng = np.random.default_rng(seed)
+    for trial in range(trials):
+        norm_map = random_map(int(rng.integers(5, 31)), rng, 0.3)
+        free = np.argwhere(norm_map == 0)
+        if len(free) < 2:
+            continue
+        start, goal = ((int(row), int(col)) for row, col in free[rng.choice(len(free), 2, replace=False)])
+        yield trial, norm_map, start, goal
+
+
+# pylint: disable=too-many-locals
+def check_optimality(
+    algorithms: Sequence[str] = tuple(OPTIMAL_ALGORITHMS),
+    heuristics: Sequence[str] = tuple(ADMISSIBLE_HEURISTICS),
+    trials: int = 200,
+    seed: int = 0,
+) -> list[str]:
+    """
+    Plans every trial with both connectivities and compares the path costs with djikstra.
+
+    :param algorithms: names of the algorithms, which should return shortest paths
+    :param heuristics: names of the heuristics, which should be admissible
+    :param trials: number of maps, the trials of REGRESSIONS are added with seed 0
+    :param seed: seed of the maps and of the queries
+    :return: a description of every query where an algorithm did not return a shortest path
+    """
+    checked = set(range(trials)) | (set(REGRESSIONS) if seed == 0 else set())
+    failures = []
+    for trial, norm_map, start, goal in optimality_cases(max(checked) + 1, seed):
+        if trial not in checked:
+            continue
+        planner = Planner(norm_map)
+        for diagonal in (False, True):
+            shortest = path_cost(start, planner.plan(start, goal, 'djikstra', heuristics[0], diagonal))
+            for algorithm, heuristic in configurations(algorithms, heuristics):
+                cost = path_cost(start, planner.plan(start, goal, algorithm, heuristic, diagonal))
+                if cost != shortest:
+                    failures.append(
+                        f"trial {trial}: {algorithm}/{heuristic}/{'8' if diagonal else '4'} from {start} to {goal} "
+                        f"costs {cost} instead of {shortest}"
+                    )
+    return failures
+
+
+def main() -> None:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--algorithms', nargs='+', default=OPTIMAL_ALGORITHMS)
+    parser.add_argument('--heuristics', nargs='+', default=ADMISSIBLE_HEURISTICS)
+    parser.add_argument('--trials', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    failures = check_optimality(arguments.algorithms, arguments.heuristics, arguments.trials, arguments.seed)
+    print('\n'.join(failures) or 'Every path is a shortest path.')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
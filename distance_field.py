@@ -0,0 +1,135 @@
+"""
+This file contains the goal rooted distance fields, which answer every later query to the same goal by
+following the successor of each cell towards the goal.
+"""
+# pylint: disable=duplicate-code
+from collections import OrderedDict
+from typing import Any, Callable, TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+from grid import GridGraph
+from heuristic import manhattan_distance
+from node import Position
+from openlist import OpenList
+
+
+class DistanceField:
+    """
+    Cost of the shortest path from every cell to one goal, and the next cell on that path.
+    """
+
+    def __init__(self, graph: GridGraph, distance: npt.NDArray[Any], successor: npt.NDArray[Any]):
+        """
+        Parameters
+        ----------
+        graph : GridGraph
+            graph the field was computed on, used to convert between cells and positions
+        distance : numpy.ndarray
+            flat array of the cost to the goal, infinity for the cells that cannot reach it
+        successor : numpy.ndarray
+            flat array of the next cell towards the goal, -1 for the goal and the cells that cannot reach it
+        """
+        self.graph = graph
+        self.goal_index = graph.goal_index
+        self.distance = distance
+        self.successor = successor
+
+    def cost(self, start: Position) -> float:
+        """
+        return: the cost of the shortest path from the start to the goal, infinity if there is none
+        """
+        return float(self.distance[self.graph.index(start)])
+
+    def path(self, start: Position) -> list[Position]:
+        """
+        return: the path from the start (excluded) to the goal, empty if the goal cannot be reached
+        """
+        index = self.graph.index(start)
+        if not np.isfinite(self.distance[index]):
+            return []
+
+        path: list[Position] = []
+        while index != self.goal_index:
+            index = int(self.successor[index])
+            path.append(self.graph.position(index))
+        return path
+
+
+def compute_distance_field(graph: GridGraph, goal: Position, diagonal_neighbors: bool = False) -> DistanceField:
+    """
+    Runs Djikstra from the goal over every reachable cell. The moves cost the same in both directions, so the
+    parent of a cell in that search is its successor towards the goal.
+
+    :param graph: the grid, its search state is reset
+    :param goal: the goal position
+    :param diagonal_neighbors: whether diagonal neighbors are allowed
+    :return: the distance field of the goal
+    """
+    graph.reset(goal, manhattan_distance, diagonal_neighbors, lazy_heuristic=True)
+    open_list = OpenList()
+    graph.set_cost(graph.goal_index, 0, -1)
+    open_list.push(graph.goal_index, 0)
+
+    while open_list:
+        current_index = open_list.pop()
+        graph.mark_visited(current_index)
+
+        for neighbor, weight in graph.neighbors(current_index):
+            distance = graph.g[current_index] + weight
+            if distance < graph.cost(neighbor):
+                graph.set_cost(neighbor, distance, current_index)
+                open_list.push(neighbor, distance)
+
+    reached = graph.stamp == graph.epoch
+    return DistanceField(graph, np.where(reached, graph.g, np.inf), np.where(reached, graph.parent, -1))
+
+
+# Function computing the field of a goal on a graph, with or without diagonal neighbors
+FieldFunction: TypeAlias = Callable[[GridGraph, Position, bool], DistanceField]
+
+
+class DistanceFieldCache:
+    """
+    Bounded least recently used cache of the distance fields of a map, keyed by goal and connectivity.
+    """
+
+    def __init__(self, capacity: int = 8, compute: FieldFunction = compute_distance_field):
+        """
+        Parameters
+        ----------
+        capacity : int, optional
+            maximum number of fields kept, each holds two arrays of the size of the map
+        compute : FieldFunction, optional
+            function computing the missing fields, e.g. wavefront.wavefront_field
+        """
+        self.capacity = capacity
+        self.compute = compute
+        self.fields: OrderedDict[tuple[Position, bool], DistanceField] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, graph: GridGraph, goal: Position, diagonal_neighbors: bool = False) -> DistanceField:
+        """
+        return: the cached field of the goal, computed on the graph if it is not cached
+        """
+        key = ((int(goal[0]), int(goal[1])), diagonal_neighbors)
+        field = self.fields.get(key)
+        if field is not None:
+            self.hits += 1
+            self.fields.move_to_end(key)
+            return field
+
+        self.misses += 1
+        field = self.compute(graph, key[0], diagonal_neighbors)
+        self.fields[key] = field
+        if len(self.fields) > self.capacity:
+            self.fields.popitem(last=False)
+        return field
+
+    def clear(self) -> None:
+        """
+        Drops every field, the map they were computed on has changed.
+        """
+        self.fields.clear()
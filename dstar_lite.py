@@ -0,0 +1,177 @@
+"""
+This file contains D* Lite, an incremental planner that repairs its previous solution when cells of the map
+change instead of searching again from scratch.
+"""
+import math
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from grid import GridGraph
+from heuristic import HEURISTICS
+from node import Position
+from openlist import OpenList
+
+
+class DStarLite:
+    """
+    D* Lite (Koenig and Likhachev) on the grid.
+
+    The search runs backwards from the goal, so g is the cost from a cell to the goal and rhs is its one step
+    lookahead. A change of the map only makes the changed cells and their neighbors inconsistent, and the next
+    replan only expands the cells whose cost to the goal is affected by them. The keys of the open list are
+    (min(g, rhs) + h + km, min(g, rhs)) with h towards the start.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        norm_map: npt.NDArray[Any],
+        start: Position,
+        goal: Position,
+        heuristic: str = 'manhattan',
+        diagonal: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        norm_map : numpy.ndarray
+            2D map where obstacles are 1 and free space is 0, copied so that changes go through update_map
+        start : Position
+            (row, column) of the start cell
+        goal : Position
+            (row, column) of the goal cell
+        heuristic : str, optional
+            name of the heuristic, one of heuristic.HEURISTICS, it has to be consistent
+        diagonal : bool, optional
+            whether diagonal neighbors are allowed
+        """
+        self.norm_map = np.array(norm_map)
+        self.graph = GridGraph(self.norm_map)
+        self.heuristic_function = HEURISTICS[heuristic]
+        # The heuristic is towards the start, the search goes from the goal to the start
+        self.graph.reset(start, self.heuristic_function, diagonal)
+
+        self.start_index = self.graph.index(start)
+        self.goal_index = self.graph.index(goal)
+        self.g = np.full(self.graph.size, np.inf)
+        self.rhs = np.full(self.graph.size, np.inf)
+        self.km = 0.0
+        self.expansions = 0
+
+        self.open_list = OpenList()
+        self.rhs[self.goal_index] = 0
+        self.open_list.push(self.goal_index, self.key(self.goal_index))
+
+    def key(self, index: int) -> tuple[float, float]:
+        """
+        return: the priority of the cell in the open list
+        """
+        cost = min(self.g[index], self.rhs[index])
+        return cost + self.graph.heuristic(index) + self.km, cost
+
+    def lookahead(self, index: int) -> float:
+        """
+        return: the cost to the goal through the best neighbor of the cell
+        """
+        if self.graph.occupancy[index]:
+            return math.inf
+        return min((weight + self.g[neighbor] for neighbor, weight in self.graph.neighbors(index)), default=math.inf)
+
+    def update_vertex(self, index: int) -> None:
+        """
+        Recomputes the lookahead of the cell and puts it in the open list if and only if it is inconsistent.
+        """
+        if index != self.goal_index:
+            self.rhs[index] = self.lookahead(index)
+        if self.g[index] != self.rhs[index]:
+            self.open_list.push(index, self.key(index))
+        else:
+            self.open_list.remove(index)
+
+    def compute_shortest_path(self) -> None:
+        """
+        Expands the inconsistent cells until the cost of the start is known.
+        """
+        start = self.start_index
+        while self.open_list and (
+            self.open_list.peek() < self.key(start) or self.rhs[start] > self.g[start]
+        ):
+            old_key = self.open_list.peek()
+            index = self.open_list.pop()
+            self.expansions += 1
+
+            new_key = self.key(index)
+            if old_key < new_key:
+                self.open_list.push(index, new_key)
+            elif self.g[index] > self.rhs[index]:
+                self.g[index] = self.rhs[index]
+                for neighbor, weight in self.graph.neighbors(index):
+                    if neighbor != self.goal_index and weight + self.g[index] < self.rhs[neighbor]:
+                        self.rhs[neighbor] = weight + self.g[index]
+                        self.update_vertex(neighbor)
+            else:
+                self.g[index] = math.inf
+                self.update_vertex(index)
+                for neighbor, _ in self.graph.neighbors(index):
+                    self.update_vertex(neighbor)
+
+    def path(self) -> list[Position]:
+        """
+        return: the path from the start (excluded) to the goal following the best neighbor of every cell, empty
+        if the goal cannot be reached
+        """
+        if not math.isfinite(self.rhs[self.start_index]):
+            return []
+
+        path: list[Position] = []
+        index = self.start_index
+        while index != self.goal_index and len(path) < self.graph.size:
+            best_cost, index = min(
+                ((weight + self.g[neighbor], neighbor) for neighbor, weight in self.graph.neighbors(index)),
+                default=(math.inf, -1),
+            )
+            if not math.isfinite(best_cost):
+                return []
+            path.append(self.graph.position(index))
+        return path
+
+    def plan(self) -> list[Position]:
+        """
+        return: the path from the start (excluded) to the goal on the current map, empty if there is none
+        """
+        self.compute_shortest_path()
+        return self.path()
+
+    def move_start(self, start: Position) -> None:
+        """
+        Moves the start, e.g. to the current cell of the robot, keeping the keys of the open list valid.
+        """
+        self.km += self.graph.heuristic(self.graph.index(start))
+        self.graph.reset(start, self.heuristic_function, self.graph.diagonal_neighbors)
+        self.start_index = self.graph.index(start)
+
+    def update_cells(self, cells: npt.NDArray[Any]) -> None:
+        """
+        Repairs the search after the occupancy of the cells changed in norm_map.
+
+        :param cells: cell ids of the changed cells
+        """
+        for index in np.asarray(cells).reshape(-1).tolist():
+            self.update_vertex(index)
+            for neighbor, _ in self.graph.neighbors(index):
+                self.update_vertex(neighbor)
+
+    def update_map(self, norm_map: npt.NDArray[Any]) -> npt.NDArray[np.intp]:
+        """
+        Replaces the map with a new version of it and repairs the search for the cells that changed.
+
+        :param norm_map: 2D map of the same shape where obstacles are 1 and free space is 0
+        :return: cell ids of the cells that changed
+        """
+        changed = np.flatnonzero(self.graph.occupancy != np.asarray(norm_map).reshape(-1))
+        np.copyto(self.norm_map, norm_map)
+        self.update_cells(changed)
+        return changed
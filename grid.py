@@ -0,0 +1,283 @@
+"""
+This file contains the GridGraph class, the flat array representation of the occupancy grid that
+the search algorithms run on.
+"""
+from typing import Any, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from heuristic import VECTORIZED, heuristic_field, manhattan_distance
+from node import HeuristicFunction, Position
+
+# (row, column) offsets of the neighbors of a cell, in the order they are generated
+STRAIGHT_MOVES: list[Position] = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+DIAGONAL_MOVES: list[Position] = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+# Diagonals are penalized further than sqrt(2) so the robot does not favor them on the discretized grid
+STRAIGHT_WEIGHT = 1.0
+DIAGONAL_WEIGHT = 2.0
+
+# The moves as (move, 2) arrays and the weight of each move, for the neighbors of many cells at once
+_MOVE_ARRAYS = {
+    diagonal: np.array(STRAIGHT_MOVES + DIAGONAL_MOVES if diagonal else STRAIGHT_MOVES) for diagonal in (False, True)
+}
+_MOVE_WEIGHTS = {
+    diagonal: np.where(moves.all(axis=1), DIAGONAL_WEIGHT, STRAIGHT_WEIGHT) for diagonal, moves in _MOVE_ARRAYS.items()
+}
+
+# Below this many cells, discover_many discovers them one by one, which is cheaper than the NumPy calls
+_BATCH_FROM = 8
+
+
+class GridGraph:
+    """
+    Grid of the world stored as flat contiguous arrays indexed by cell id (row * cols + col).
+
+    The occupancy grid is shared with the map it was built from, the search state (g-costs, f-costs,
+    parent indices and visited flags) is owned by the graph. The search state of a cell is only valid when
+    its stamp equals the epoch of the current search, so reset() invalidates it in constant time by starting
+    a new epoch and the arrays are reused by every search on the map.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, norm_map: npt.NDArray[Any]):
+        """
+        Parameters
+        ----------
+        norm_map : numpy.ndarray
+            2D map where obstacles are 1 and free space is 0.
+        """
+        self.rows: int = norm_map.shape[0]
+        self.cols: int = norm_map.shape[1]
+        self.size = self.rows * self.cols
+        self.occupancy: npt.NDArray[Any] = np.ascontiguousarray(norm_map).reshape(-1)
+
+        self.g = np.full(self.size, np.inf)
+        self.f = np.full(self.size, np.inf)
+        # Heuristic of every cell, None when it is computed lazily for the visited cells only
+        self.h: Optional[npt.NDArray[Any]] = None
+        self.heuristic_function: HeuristicFunction = manhattan_distance
+        self.parent = np.full(self.size, -1, dtype=np.int64)
+        # Epoch in which g, f and parent were last written, and in which the cell was last visited
+        self.stamp = np.zeros(self.size, dtype=np.uint32)
+        self.visited = np.zeros(self.size, dtype=np.uint32)
+        self.epoch = 0
+
+        self.goal: Position = (0, 0)
+        self.goal_index = 0
+        self.diagonal_neighbors = False
+        self.cost_addition = 1
+        # Multiplier of the weight of the moves into every cell, None when the weights are not scaled
+        self.cost_scale: Optional[npt.NDArray[np.float64]] = None
+        # Graph on the same occupancy for the backward half of bidirectional searches, created when first needed
+        self.reverse_graph: Optional['GridGraph'] = None
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def reset(
+        self,
+        goal: Position,
+        heuristic_function: HeuristicFunction,
+        diagonal_neighbors: bool = False,
+        cost_addition: int = 1,
+        lazy_heuristic: bool = False,
+        cost_scale: Optional[npt.NDArray[np.float64]] = None,
+    ) -> None:
+        """
+        Clears the search state and prepares the graph for a search towards goal.
+
+        Parameters
+        ----------
+        goal : Position
+            (row, column) of the goal cell.
+        heuristic_function : HeuristicFunction
+            function to apply to calculate the heuristic
+        diagonal_neighbors : bool, optional
+            whether diagonal neighbors are allowed
+        cost_addition : int, optional
+            multiplier of the edge weights, 0 turns A* into greedy best-first search
+        lazy_heuristic : bool, optional
+            compute the heuristic of a cell when it is visited instead of the cached field of the whole grid,
+            for sparse searches on large maps
+        cost_scale : numpy.ndarray, optional
+            flat array of at least 1 per cell that multiplies the weight of the moves into the cell, e.g. to keep
+            away from obstacles, which keeps the heuristics admissible. Only the searches that take the weights
+            from neighbors use it
+        """
+        self.goal = (int(goal[0]), int(goal[1]))
+        self.goal_index = self.index(self.goal)
+        self.diagonal_neighbors = diagonal_neighbors
+        self.cost_addition = cost_addition
+        self.cost_scale = cost_scale
+        self.heuristic_function = heuristic_function
+
+        # Heuristics without a vectorized form are always computed lazily
+        if lazy_heuristic or heuristic_function not in VECTORIZED:
+            self.h = None
+        else:
+            self.h = heuristic_field(heuristic_function, self.goal, (self.rows, self.cols))
+
+        self.epoch += 1
+        if self.epoch == np.iinfo(np.uint32).max:
+            self.stamp.fill(0)
+            self.visited.fill(0)
+            self.epoch = 1
+
+    def reverse(self, start: Position) -> 'GridGraph':
+        """
+        Prepares the graph of the backward search, which goes from the goal of this graph towards start with
+        the same settings. It shares the occupancy and is reused by the following searches.
+
+        return: the graph of the backward search
+        """
+        if self.reverse_graph is None:
+            self.reverse_graph = GridGraph(self.occupancy.reshape(self.rows, self.cols))
+        self.reverse_graph.reset(
+            start, self.heuristic_function, self.diagonal_neighbors, self.cost_addition, self.h is None
+        )
+        return self.reverse_graph
+
+    def index(self, pos: Position) -> int:
+        """
+        return: the cell id of the (row, column) position
+        """
+        return pos[0] * self.cols + pos[1]
+
+    def position(self, index: int) -> Position:
+        """
+        return: the (row, column) position of the cell id
+        """
+        row, col = divmod(index, self.cols)
+        return row, col
+
+    def heuristic(self, index: int) -> float:
+        """
+        return: the heuristic distance from the cell to the goal
+        """
+        if self.h is None:
+            return self.heuristic_function(self.position(index), self.goal)
+        return float(self.h[index])
+
+    def cost(self, index: int) -> float:
+        """
+        return: the g-cost of the cell in the current search, infinity if it has not been reached
+        """
+        if self.stamp[index] != self.epoch:
+            return np.inf
+        return float(self.g[index])
+
+    def set_cost(self, index: int, cost: float, parent: int) -> None:
+        """
+        Records that the cell is reached from parent with the g-cost, and opens it again if it was visited.
+        """
+        self.g[index] = cost
+        self.parent[index] = parent
+        self.stamp[index] = self.epoch
+        self.visited[index] = 0
+
+    def is_visited(self, index: int) -> bool:
+        """
+        return: whether the cell has been visited in the current search
+        """
+        return bool(self.visited[index] == self.epoch)
+
+    def mark_visited(self, index: int) -> None:
+        """
+        Marks the cell as visited in the current search.
+        """
+        self.visited[index] = self.epoch
+
+    def traversable(self, index: int) -> bool:
+        """
+        return: True if the cell can be traversed, False otherwise
+        """
+        return not self.occupancy[index]
+
+    def neighbors(self, index: int) -> list[tuple[int, float]]:
+        """
+        return: the traversable neighbors of the cell and the weight of the move to each of them
+        """
+        row, col = divmod(index, self.cols)
+        moves = STRAIGHT_MOVES + DIAGONAL_MOVES if self.diagonal_neighbors else STRAIGHT_MOVES
+        cost_scale = self.cost_scale
+
+        neighbor_list: list[tuple[int, float]] = []
+        for d_row, d_col in moves:
+            n_row = row + d_row
+            n_col = col + d_col
+            if n_row < 0 or n_col < 0 or n_row >= self.rows or n_col >= self.cols:
+                continue
+
+            neighbor = n_row * self.cols + n_col
+            if self.occupancy[neighbor]:
+                continue
+
+            weight = DIAGONAL_WEIGHT if d_row and d_col else STRAIGHT_WEIGHT
+            if cost_scale is not None:
+                weight *= float(cost_scale[neighbor])
+            neighbor_list.append((neighbor, weight))
+
+        return neighbor_list
+
+    def discover(self, index: int) -> list[int]:
+        """
+        Marks the unvisited traversable neighbors of the cell as visited, with the cell as their parent.
+
+        return: the cell ids of the newly visited neighbors
+        """
+        neighbor_list: list[int] = []
+        for neighbor, weight in self.neighbors(index):
+            if self.is_visited(neighbor):
+                continue
+
+            self.set_cost(neighbor, self.g[index] + self.cost_addition * weight, index)
+            self.mark_visited(neighbor)
+            self.f[neighbor] = self.g[neighbor] + self.heuristic(neighbor)
+            neighbor_list.append(neighbor)
+
+        return neighbor_list
+
+    def discover_many(self, indices: npt.NDArray[np.intp]) -> npt.NDArray[np.intp]:
+        """
+        Vectorized discover of every cell of indices, in order: a neighbor of several of the cells takes the
+        first of them as parent, like with one call of discover per cell.
+
+        return: the cell ids of the newly visited neighbors, in the order discover would have visited them
+        """
+        if len(indices) < _BATCH_FROM:
+            return np.array([neighbor for index in indices.tolist() for neighbor in self.discover(index)], np.intp)
+
+        moves = _MOVE_ARRAYS[self.diagonal_neighbors]
+        rows = indices[:, None] // self.cols + moves[:, 0]
+        cols = indices[:, None] % self.cols + moves[:, 1]
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+
+        # Flattened cell by cell and move by move, which is the order of discover
+        neighbors: npt.NDArray[np.intp] = (rows * self.cols + cols)[inside]
+        inside = inside.reshape(-1)
+        parents = indices.repeat(len(moves))[inside]
+        weights = np.tile(_MOVE_WEIGHTS[self.diagonal_neighbors], len(indices))[inside]
+        new = (self.occupancy[neighbors] == 0) & (self.visited[neighbors] != self.epoch)
+        neighbors, parents, weights = neighbors[new], parents[new], weights[new]
+
+        # Keeps the first occurrence of every neighbor, the f-costs of the neighbors are overwritten below so
+        # they hold the position of the first occurrence meanwhile, which is cheaper than sorting
+        order = np.arange(neighbors.size, dtype=float)
+        self.f[neighbors] = np.inf
+        np.minimum.at(self.f, neighbors, order)
+        first = self.f[neighbors] == order
+        neighbors, parents, weights = neighbors[first], parents[first], weights[first]
+        if self.cost_scale is not None:
+            weights = weights * self.cost_scale[neighbors]
+
+        self.g[neighbors] = self.g[parents] + self.cost_addition * weights
+        self.parent[neighbors] = parents
+        self.stamp[neighbors] = self.epoch
+        self.visited[neighbors] = self.epoch
+        if self.h is None:
+            heuristic = np.array([self.heuristic(int(neighbor)) for neighbor in neighbors], dtype=float)
+        else:
+            heuristic = self.h[neighbors]
+        self.f[neighbors] = self.g[neighbors] + heuristic
+        return neighbors
@@ -0,0 +1,310 @@
+"""
+This file contains HeadlessSim, a local stand-in for the CoppeliaSim sim object that replays a recorded or
+synthetic scene, so the planning pipeline runs without a simulator and without a ZMQ connection.
+"""
+from collections import Counter
+import time
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from morphology import dilate, disk_kernel
+from node import Position
+
+# Names of the objects of the scene used by the project
+CAMERA = "/world_camera"
+ROBOT = "/PioneerP3DX"
+TRACKPOINT = "/track_point"
+GOAL = "/goal_point"
+
+
+class HeadlessSim:
+    """
+    Implements the calls of the sim object that the project makes, on a scene held in memory.
+
+    The vision sensor returns the stored grayscale image, where obstacles are dark and free space is bright.
+    Objects only have a position, and the robot drives at speed towards the trackpoint, which stands in for the
+    controller of the real scene. Like the real simulator, the scene runs on wall clock time, scaled by
+    real_time_factor, unless stepping is enabled, in which case time only advances by time_step on every step().
+    Every call counts as one round trip to the simulator.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    handle_world = -1
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        image: npt.NDArray[Any],
+        positions: Optional[Mapping[str, npt.ArrayLike]] = None,
+        speed: float = 0.5,
+        time_step: float = 0.05,
+        real_time_factor: float = 1.0,
+    ):
+        """
+        Parameters
+        ----------
+        image : numpy.ndarray
+            (rows, cols) uint8 image of the world camera
+        positions : dict, optional
+            (x, y, z) world position of every object by name, the objects used by main.py default to the origin
+            and the trackpoint to the robot
+        speed : float, optional
+            speed of the robot in meters per simulated second
+        time_step : float, optional
+            simulated seconds of a step
+        real_time_factor : float, optional
+            simulated seconds per wall clock second when stepping is disabled
+        """
+        self.image = np.ascontiguousarray(image, dtype=np.uint8)
+        self.speed = speed
+        self.time_step = time_step
+        self.real_time_factor = real_time_factor
+        self.simulation_time = 0.0
+        self.stepping = False
+        self.clock = time.perf_counter()
+        self.names: dict[str, int] = {}
+        self.positions: dict[int, npt.NDArray[np.float64]] = {}
+        self.data_blocks: dict[tuple[int, str], bytes] = {}
+        # Number of calls of every method, the round trips a real simulator would have made
+        self.calls: Counter[str] = Counter()
+
+        positions = dict(positions or {})
+        positions.setdefault(TRACKPOINT, positions.get(ROBOT, (0.0, 0.0, 0.0)))
+        for name in (CAMERA, ROBOT, GOAL):
+            self._add(name, (0.0, 0.0, 0.0))
+        for name, position in positions.items():
+            self.positions[self._add(name, position)] = np.array(position, dtype=float)
+
+    @classmethod
+    def load(cls, path: str, **kwargs: Any) -> 'HeadlessSim':
+        """
+        Replays a scene saved by record_scene or save, or a .npy file holding only the camera image.
+
+        :param path: the file of the scene
+        :param kwargs: other arguments of HeadlessSim
+        :return: the simulator of the scene
+        """
+        if path.endswith(".npy"):
+            return cls(np.load(path), **kwargs)
+        with np.load(path) as scene:
+            positions = {name: scene[name] for name in scene.files if name != "image"}
+            return cls(scene["image"], positions, **kwargs)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the image and the object positions of the scene to an .npz file.
+        """
+        arrays: dict[str, Any] = {name: self.positions[handle] for name, handle in self.names.items()}
+        np.savez(path, image=self.image, **arrays)
+
+    def _add(self, name: str, position: npt.ArrayLike) -> int:
+        """
+        return: the handle of the object, which is created at the position if it does not exist
+        """
+        if name not in self.names:
+            self.names[name] = len(self.names)
+            self.positions[self.names[name]] = np.array(position, dtype=float)
+        return self.names[name]
+
+    def _advance(self, seconds: float) -> None:
+        """
+        Advances the simulation time, driving the robot towards the trackpoint.
+        """
+        self.simulation_time += seconds
+        robot = self.positions[self.names[ROBOT]]
+        offset = self.positions[self.names[TRACKPOINT]][:2] - robot[:2]
+        distance = float(np.linalg.norm(offset))
+        if distance > 0:
+            robot[:2] += offset * min(1.0, self.speed * seconds / distance)
+
+    def _call(self, method: str) -> None:
+        """
+        Counts the call and, without stepping, advances the simulation by the time elapsed since the last call.
+        """
+        self.calls[method] += 1
+        now = time.perf_counter()
+        if not self.stepping:
+            self._advance((now - self.clock) * self.real_time_factor)
+        self.clock = now
+
+    # The names of the methods follow the API of CoppeliaSim
+    # pylint: disable=invalid-name
+
+    def setStepping(self, enable: bool) -> int:
+        """
+        return: whether stepping was enabled before the call
+        """
+        self._call("setStepping")
+        previous = int(self.stepping)
+        self.stepping = bool(enable)
+        return previous
+
+    def step(self) -> None:
+        """
+        Advances the simulation by one time step, when stepping is enabled.
+        """
+        self._call("step")
+        if self.stepping:
+            self._advance(self.time_step)
+
+    def getSimulationTime(self) -> float:
+        """
+        return: the simulated time in seconds
+        """
+        self._call("getSimulationTime")
+        return self.simulation_time
+
+    def getObjectHandle(self, name: str) -> int:
+        """
+        return: the handle of the object
+        """
+        self._call("getObjectHandle")
+        return self._add(name, (0.0, 0.0, 0.0))
+
+    def getObjectPosition(self, handle: int, relative_to: int = -1) -> list[float]:
+        """
+        return: the (x, y, z) world position of the object, only world positions are supported
+        """
+        self._call("getObjectPosition")
+        assert relative_to == self.handle_world
+        return [float(value) for value in self.positions[handle]]
+
+    def setObjectPosition(self, handle: int, *args: Any) -> None:
+        """
+        Moves the object, with the arguments (position) or (relative_to, position).
+        """
+        self._call("setObjectPosition")
+        self.positions[handle] = np.array(args[-1][:3], dtype=float)
+
+    def setObjectPose(self, handle: int, relative_to: int, pose: Sequence[float]) -> None:
+        """
+        Moves the object to the position of the (x, y, z, qx, qy, qz, qw) pose, the orientation is ignored.
+        """
+        self._call("setObjectPose")
+        assert relative_to == self.handle_world
+        self.positions[handle] = np.array(pose[:3], dtype=float)
+
+    def getVisionSensorImg(self, handle: int, options: int = 0) -> tuple[bytes, list[int]]:
+        """
+        return: the grayscale image of the camera and its resolution
+        """
+        self._call("getVisionSensorImg")
+        assert handle == self.names[CAMERA] and options & 1
+        return self.image.tobytes(), [self.image.shape[0], self.image.shape[1]]
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,unused-argument
+    def createPath(
+        self,
+        ctrl_pts: Sequence[float],
+        options: int = 0,
+        subdiv: int = 100,
+        smoothness: float = 1.0,
+        orientation_mode: int = 0,
+        up_vector: Sequence[float] = (0.0, 0.0, 1.0),
+    ) -> int:
+        """
+        Creates a path object through the (x, y, z, qx, qy, qz, qw) control points. Its PATH data block holds
+        subdiv poses spaced evenly along the polyline of the control points, without smoothing.
+
+        return: the handle of the path object
+        """
+        self._call("createPath")
+        controls = np.asarray(ctrl_pts, dtype=float).reshape(-1, 7)
+        lengths = np.concatenate(([0.0], np.cumsum(np.linalg.norm(np.diff(controls[:, :3], axis=0), axis=1))))
+        samples = np.linspace(0.0, lengths[-1], max(subdiv, 2))
+        poses = np.zeros((samples.size, 7))
+        for axis in range(3):
+            poses[:, axis] = np.interp(samples, lengths, controls[:, axis])
+        poses[:, 6] = 1.0
+
+        handle = self._add(f"/Path{len(self.names)}", poses[0, :3])
+        self.data_blocks[(handle, "PATH")] = poses.tobytes()
+        return handle
+
+    def readCustomDataBlock(self, handle: int, tag: str) -> Optional[bytes]:
+        """
+        return: the data block of the object, None if it has none
+        """
+        self._call("readCustomDataBlock")
+        return self.data_blocks.get((handle, tag))
+
+    def unpackDoubleTable(self, data: bytes) -> list[float]:
+        """
+        return: the doubles packed in the data
+        """
+        self._call("unpackDoubleTable")
+        return [float(value) for value in np.frombuffer(data, dtype="<f8")]
+
+
+def world_position(image_shape: tuple[int, int], world_size: float, cell: Position) -> tuple[float, float, float]:
+    """
+    return: the world position of the (row, column) cell, the inverse of GridMap.get_grid_coords
+    """
+    scaling = world_size / image_shape[0]
+    return (cell[1] - image_shape[1] / 2) * scaling, (cell[0] - image_shape[0] / 2) * scaling, 0.0
+
+
+# pylint: disable=too-many-locals
+def synthetic_scene(
+    resolution: int = 256,
+    obstacles: int = 20,
+    world_size: float = 5.0,
+    clearance: int = 8,
+    seed: Optional[int] = None,
+    **kwargs: Any,
+) -> HeadlessSim:
+    """
+    Builds a scene of random rectangular obstacles, with the robot and the goal on free cells far from them.
+
+    :param resolution: number of rows and columns of the camera image
+    :param obstacles: number of rectangles
+    :param world_size: size of the world covered by the image, as given to GridMap
+    :param clearance: minimum distance in cells from the robot and the goal to the obstacles, more than the
+        inflation of the map so they stay free once it is inflated
+    :param seed: seed of the random generator
+    :param kwargs: other arguments of HeadlessSim
+    :return: the simulator of the scene
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((resolution, resolution), 255, dtype=np.uint8)
+    for _ in range(obstacles):
+        row, col = rng.integers(0, resolution, 2)
+        height, width = rng.integers(resolution // 32 + 1, resolution // 6 + 2, 2)
+        image[row:row + height, col:col + width] = 0
+
+    free = np.argwhere(~dilate(image == 0, disk_kernel(clearance)))
+    if len(free) < 2:
+        raise ValueError("No room for the robot and the goal, use fewer obstacles.")
+    robot, goal = free[rng.choice(len(free), 2, replace=False)]
+
+    positions = {
+        ROBOT: world_position(image.shape, world_size, (int(robot[0]), int(robot[1]))),
+        GOAL: world_position(image.shape, world_size, (int(goal[0]), int(goal[1]))),
+    }
+    return HeadlessSim(image, positions, **kwargs)
+
+
+def record_scene(sim: Any, path: str, names: Sequence[str] = (ROBOT, TRACKPOINT, GOAL)) -> None:
+    """
+    Saves the camera image and the object positions of a running simulation, to replay it with HeadlessSim.
+
+    :param sim: the sim object of the running simulation
+    :param path: the .npz file to write
+    :param names: names of the objects whose positions are saved
+    """
+    handles = {name: sim.getObjectHandle(name) for name in names}
+    positions = {name: sim.getObjectPosition(handle, sim.handle_world) for name, handle in handles.items()}
+
+    # Like GridMap, the robot is moved out of the view of the camera while the image is captured
+    robot = handles.get(ROBOT)
+    if robot is not None:
+        sim.setObjectPosition(robot, -1, (100, 100, 100))
+    image, resolution = sim.getVisionSensorImg(sim.getObjectHandle(CAMERA), 1)
+    if robot is not None:
+        sim.setObjectPosition(robot, -1, positions[ROBOT])
+
+    frame = np.frombuffer(bytes(image), dtype=np.uint8).reshape(resolution[0], resolution[1])
+    HeadlessSim(frame, positions).save(path)
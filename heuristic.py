@@ -2,8 +2,17 @@
 This script contains heuristic functions that is used for determining the best
 path to traverse in the maze.
 """
+from functools import lru_cache
 import random
-from node import Position
+from typing import Any, Callable, TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+from node import HeuristicFunction, Position
+
+# Vectorized form of a heuristic, evaluated elementwise on arrays of rows and columns against the goal
+HeuristicField: TypeAlias = Callable[[npt.NDArray[Any], npt.NDArray[Any], Position], npt.NDArray[Any]]
 
 
 def manhattan_distance(node1: Position, node2: Position) -> int:
@@ -59,3 +68,121 @@ def bozo_distance(_: Position, __: Position) -> int:
     :return: the Bozo distance between the two nodes
     """
     return random.randint(0, 100)
+
+
+def manhattan_distance_field(rows: npt.NDArray[Any], cols: npt.NDArray[Any], goal: Position) -> npt.NDArray[Any]:
+    """
+    Vectorized form of manhattan_distance.
+
+    :param rows: rows of the cells
+    :param cols: columns of the cells, broadcast against rows
+    :param goal: the goal node
+    :return: the Manhattan distance between every cell and the goal
+    """
+    return np.asarray(np.abs(rows - goal[0]) + np.abs(cols - goal[1]))
+
+
+def euclidean_distance_field(rows: npt.NDArray[Any], cols: npt.NDArray[Any], goal: Position) -> npt.NDArray[Any]:
+    """
+    Vectorized form of euclidean_distance.
+
+    :param rows: rows of the cells
+    :param cols: columns of the cells, broadcast against rows
+    :param goal: the goal node
+    :return: the Euclidean distance between every cell and the goal
+    """
+    return np.asarray(((rows - goal[0]) ** 2 + (cols - goal[1]) ** 2) ** 0.5).astype(int)
+
+
+def chebyshev_distance_field(rows: npt.NDArray[Any], cols: npt.NDArray[Any], goal: Position) -> npt.NDArray[Any]:
+    """
+    Vectorized form of chebyshev_distance.
+
+    :param rows: rows of the cells
+    :param cols: columns of the cells, broadcast against rows
+    :param goal: the goal node
+    :return: the Chebyshev distance between every cell and the goal
+    """
+    return np.asarray(np.maximum(np.abs(rows - goal[0]), np.abs(cols - goal[1])))
+
+
+def octile_distance_field(rows: npt.NDArray[Any], cols: npt.NDArray[Any], goal: Position) -> npt.NDArray[Any]:
+    """
+    Vectorized form of octile_distance.
+
+    :param rows: rows of the cells
+    :param cols: columns of the cells, broadcast against rows
+    :param goal: the goal node
+    :return: the Octile distance between every cell and the goal
+    """
+    dx = np.abs(rows - goal[0])
+    dy = np.abs(cols - goal[1])
+    return np.asarray(dx + dy + (2 ** 0.5 - 2) * np.minimum(dx, dy)).astype(int)
+
+
+def bozo_distance_field(rows: npt.NDArray[Any], cols: npt.NDArray[Any], _: Position) -> npt.NDArray[Any]:
+    """
+    Vectorized form of bozo_distance.
+
+    :return: a random Bozo distance for every cell
+    """
+    return np.random.randint(0, 101, size=np.broadcast(rows, cols).shape)
+
+
+HEURISTICS: dict[str, HeuristicFunction] = {
+    'manhattan': manhattan_distance,
+    'euclidean': euclidean_distance,
+    'chebyshev': chebyshev_distance,
+    'octile': octile_distance,
+    'bozo': bozo_distance,
+}
+
+VECTORIZED: dict[HeuristicFunction, HeuristicField] = {
+    manhattan_distance: manhattan_distance_field,
+    euclidean_distance: euclidean_distance_field,
+    chebyshev_distance: chebyshev_distance_field,
+    octile_distance: octile_distance_field,
+    bozo_distance: bozo_distance_field,
+}
+
+
+# Heuristics that draw new values on every call, their fields are drawn again for every search
+STOCHASTIC: set[HeuristicFunction] = {bozo_distance}
+
+
+def _compute_field(heuristic_function: HeuristicFunction, goal: Position, shape: tuple[int, int]) -> npt.NDArray[Any]:
+    """
+    return: read only flat array of the heuristic of every cell, indexed by cell id
+    """
+    rows, cols = np.ogrid[0:shape[0], 0:shape[1]]
+    field = np.ascontiguousarray(VECTORIZED[heuristic_function](rows, cols, goal)).reshape(-1)
+    field.setflags(write=False)
+    return field
+
+
+_cached_field = lru_cache(maxsize=16)(_compute_field)
+
+
+def clear_fields() -> None:
+    """
+    Drops the cached heuristic fields, so the next search computes its field again, e.g. to time it cold.
+    """
+    _cached_field.cache_clear()
+
+
+def heuristic_field(
+    heuristic_function: HeuristicFunction, goal: Position, shape: tuple[int, int]
+) -> npt.NDArray[Any]:
+    """
+    Computes the heuristic of every cell of a grid in one NumPy expression. Fields are cached per
+    (heuristic, goal, grid shape), so repeated queries to the same goal reuse them, except for the STOCHASTIC
+    heuristics, whose noise is drawn again for every search as their scalar form does.
+
+    :param heuristic_function: one of the heuristics of this file
+    :param goal: the goal node
+    :param shape: (rows, columns) of the grid
+    :return: read only flat array of the heuristic indexed by cell id
+    """
+    if heuristic_function in STOCHASTIC:
+        return _compute_field(heuristic_function, goal, shape)
+    return _cached_field(heuristic_function, goal, shape)
@@ -0,0 +1,347 @@
+"""
+This file contains hierarchical path-finding A* (HPA*), which plans on a cached abstract graph of the entrances
+between square clusters of the map and refines the route cell by cell only inside the clusters it crosses.
+"""
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from grid import DIAGONAL_MOVES, DIAGONAL_WEIGHT, STRAIGHT_MOVES, STRAIGHT_WEIGHT
+from heuristic import manhattan_distance
+from node import HeuristicFunction, Position
+from openlist import OpenList
+
+# Runs of crossable cells at least this long get an entrance at both ends instead of one in the middle
+LONG_ENTRANCE = 6
+
+
+def _moves(diagonal: bool) -> list[tuple[int, int, float]]:
+    """
+    return: the (row offset, column offset, weight) of the moves, in the order of GridGraph.neighbors
+    """
+    moves = [(d_row, d_col, STRAIGHT_WEIGHT) for d_row, d_col in STRAIGHT_MOVES]
+    if diagonal:
+        moves += [(d_row, d_col, DIAGONAL_WEIGHT) for d_row, d_col in DIAGONAL_MOVES]
+    return moves
+
+
+def _shift(offset: int, length: int) -> tuple[slice, slice]:
+    """
+    return: the slices of the sources and of the targets of a move by offset along an axis of the length
+    """
+    if offset >= 0:
+        return slice(0, length - offset), slice(offset, length)
+    return slice(-offset, length), slice(0, length + offset)
+
+
+def _relax(free: npt.NDArray[np.bool_], distance: npt.NDArray[Any], diagonal: bool) -> npt.NDArray[Any]:
+    """
+    Propagates the distances to the neighboring free cells until none of them decreases, which turns the
+    distances of the sources into the cost of the shortest path to them inside the block.
+
+    :param free: (rows, cols) mask of the traversable cells of the block
+    :param distance: (..., rows, cols) initial distances, 0 at the sources and infinity elsewhere
+    :param diagonal: whether diagonal neighbors are allowed
+    :return: the distances, infinity for the cells that cannot reach a source
+    """
+    rows, cols = free.shape
+    moves = [(*_shift(d_row, rows), *_shift(d_col, cols), weight) for d_row, d_col, weight in _moves(diagonal)]
+    while True:
+        relaxed = distance.copy()
+        for source_rows, target_rows, source_cols, target_cols, weight in moves:
+            np.minimum(
+                relaxed[..., target_rows, target_cols],
+                distance[..., source_rows, source_cols] + weight,
+                out=relaxed[..., target_rows, target_cols],
+            )
+        relaxed[..., ~free] = np.inf
+        if np.array_equal(relaxed, distance):
+            return relaxed
+        distance = relaxed
+
+
+def _descend(distance: npt.NDArray[Any], row: int, col: int, diagonal: bool) -> list[Position]:
+    """
+    return: the cells from (row, col) (excluded) down the distances to their source, in block coordinates
+    """
+    rows, cols = distance.shape
+    moves = _moves(diagonal)
+    path: list[Position] = []
+    while distance[row, col] > 0:
+        _, row, col = min(
+            (weight + distance[row + d_row, col + d_col], row + d_row, col + d_col)
+            for d_row, d_col, weight in moves
+            if 0 <= row + d_row < rows and 0 <= col + d_col < cols
+        )
+        path.append((row, col))
+    return path
+
+
+def _crossings(
+    first: npt.NDArray[np.bool_], second: npt.NDArray[np.bool_], cluster_size: int, diagonal: bool
+) -> list[tuple[int, int, float]]:
+    """
+    Finds the moves across the boundary between two adjacent lines of cells.
+
+    Every run of cells whose straight crossing is free gets one entrance, or two if it is long, and the runs
+    are split where the clusters along the boundary change. A diagonal crossing is only added where neither of
+    its cells has a straight crossing, every other one can be replaced by a straight crossing and a move
+    inside a cluster.
+
+    :param first: free cells of the line before the boundary
+    :param second: free cells of the line after the boundary
+    :param cluster_size: number of cells of a cluster along the line
+    :param diagonal: whether diagonal neighbors are allowed
+    :return: (position in first, position in second, weight) of every crossing
+    """
+    straight = first & second
+    crossings: list[tuple[int, int, float]] = []
+    for begin in range(0, straight.size, cluster_size):
+        edges = np.diff(np.concatenate(([0], straight[begin:begin + cluster_size].astype(np.int8), [0])))
+        for run_begin, run_end in zip(np.flatnonzero(edges == 1) + begin, np.flatnonzero(edges == -1) + begin):
+            if run_end - run_begin >= LONG_ENTRANCE:
+                positions = [int(run_begin), int(run_end) - 1]
+            else:
+                positions = [int(run_begin + run_end - 1) // 2]
+            crossings += [(position, position, STRAIGHT_WEIGHT) for position in positions]
+
+    if diagonal:
+        for offset in (1, -1):
+            sources, targets = _shift(offset, straight.size)
+            diagonal_only = first[sources] & second[targets] & ~second[sources] & ~first[targets]
+            crossings += [
+                (int(position), int(position) + offset, DIAGONAL_WEIGHT)
+                for position in np.flatnonzero(diagonal_only) + sources.start
+            ]
+    return crossings
+
+
+class HierarchicalGraph:
+    """
+    Abstract graph of a map for HPA* (Botea, Mueller and Schaeffer).
+
+    The map is split into square clusters. The entrances are the cells on both sides of the chosen crossings
+    of the cluster boundaries, and the distances from every entrance to every cell of its cluster are cached.
+    A query runs A* on the entrances, which are linked by their crossings and by the cached distances inside
+    their clusters, and then walks down the cached distances through the clusters of the route only. The
+    path can be slightly longer than the shortest path, since the route has to cross the boundaries at
+    the entrances. When cells change, only the clusters that contain them or whose entrances moved are
+    computed again.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, norm_map: npt.NDArray[Any], cluster_size: int = 16, diagonal: bool = False):
+        """
+        Parameters
+        ----------
+        norm_map : numpy.ndarray
+            2D map where obstacles are 1 and free space is 0, shared with the graph, call update_cells after
+            writing to it
+        cluster_size : int, optional
+            number of cells along the side of a cluster
+        diagonal : bool, optional
+            whether diagonal neighbors are allowed
+        """
+        self.norm_map = norm_map
+        self.rows: int = norm_map.shape[0]
+        self.cols: int = norm_map.shape[1]
+        self.cluster_size = cluster_size
+        self.diagonal = diagonal
+        self.cluster_cols: int = -(-self.cols // cluster_size)
+        self.cluster_count = -(-self.rows // cluster_size) * self.cluster_cols
+
+        # Entrance cells of every cluster and their distances to every cell of the cluster (entrance, row, col)
+        self.entrances: dict[int, list[int]] = {}
+        self.distances: dict[int, npt.NDArray[Any]] = {}
+        # Moves of every entrance to the other entrances of its cluster, and across the cluster boundaries
+        self.edges: dict[int, list[tuple[int, float]]] = {}
+        self.transitions: dict[int, list[tuple[int, float]]] = {}
+        self.clusters_built = 0
+
+        self.transitions = self._find_transitions()
+        entrances = self._group_entrances()
+        for cluster in range(self.cluster_count):
+            self._build_cluster(cluster, entrances.get(cluster, []))
+
+    def cluster(self, index: int) -> int:
+        """
+        return: the id of the cluster of the cell
+        """
+        row, col = divmod(index, self.cols)
+        return (row // self.cluster_size) * self.cluster_cols + col // self.cluster_size
+
+    def bounds(self, cluster: int) -> tuple[slice, slice]:
+        """
+        return: the rows and the columns of the map covered by the cluster
+        """
+        cluster_row, cluster_col = divmod(cluster, self.cluster_cols)
+        row, col = cluster_row * self.cluster_size, cluster_col * self.cluster_size
+        return slice(row, min(row + self.cluster_size, self.rows)), slice(col, min(col + self.cluster_size, self.cols))
+
+    def _free(self, cluster: int) -> npt.NDArray[np.bool_]:
+        """
+        return: the mask of the traversable cells of the cluster
+        """
+        rows, cols = self.bounds(cluster)
+        return np.asarray(self.norm_map[rows, cols] == 0)
+
+    def _distances_from(self, cluster: int, indices: list[int]) -> npt.NDArray[Any]:
+        """
+        return: the (source, row, col) distances from every cell of the list to the cells of the cluster
+        """
+        rows, cols = self.bounds(cluster)
+        distance = np.full((len(indices), rows.stop - rows.start, cols.stop - cols.start), np.inf)
+        for number, index in enumerate(indices):
+            row, col = divmod(index, self.cols)
+            distance[number, row - rows.start, col - cols.start] = 0
+        return _relax(self._free(cluster), distance, self.diagonal)
+
+    def _find_transitions(self) -> dict[int, list[tuple[int, float]]]:
+        """
+        return: the crossings of every cluster boundary, in both directions
+        """
+        free = np.asarray(self.norm_map == 0)
+        transitions: dict[int, list[tuple[int, float]]] = {}
+
+        def add(first: int, second: int, weight: float) -> None:
+            transitions.setdefault(first, []).append((second, weight))
+            transitions.setdefault(second, []).append((first, weight))
+
+        for row in range(self.cluster_size, self.rows, self.cluster_size):
+            for first, second, weight in _crossings(free[row - 1], free[row], self.cluster_size, self.diagonal):
+                add((row - 1) * self.cols + first, row * self.cols + second, weight)
+        for col in range(self.cluster_size, self.cols, self.cluster_size):
+            for first, second, weight in _crossings(free[:, col - 1], free[:, col], self.cluster_size, self.diagonal):
+                add(first * self.cols + col - 1, second * self.cols + col, weight)
+        return transitions
+
+    def _group_entrances(self) -> dict[int, list[int]]:
+        """
+        return: the sorted entrance cells of every cluster that has any
+        """
+        entrances: dict[int, list[int]] = {}
+        for index in sorted(self.transitions):
+            entrances.setdefault(self.cluster(index), []).append(index)
+        return entrances
+
+    def _build_cluster(self, cluster: int, entrances: list[int]) -> None:
+        """
+        Computes the distances from the entrances of the cluster and the moves between them.
+        """
+        for entrance in self.entrances.pop(cluster, []):
+            self.edges.pop(entrance, None)
+
+        distance = self._distances_from(cluster, entrances)
+        rows, cols = self.bounds(cluster)
+        entrance_rows, entrance_cols = np.divmod(np.array(entrances, dtype=np.intp), self.cols)
+        # Distance from every entrance (first axis) to every other entrance (second axis)
+        costs = distance[:, entrance_rows - rows.start, entrance_cols - cols.start].tolist()
+        for entrance, entrance_costs in zip(entrances, costs):
+            self.edges[entrance] = [
+                (other, cost) for other, cost in zip(entrances, entrance_costs)
+                if other != entrance and cost != np.inf
+            ]
+
+        self.entrances[cluster] = entrances
+        self.distances[cluster] = distance
+        self.clusters_built += 1
+
+    def update_cells(self, cells: npt.NDArray[Any]) -> list[int]:
+        """
+        Computes again the parts of the graph affected by the cells that changed in norm_map.
+
+        :param cells: cell ids of the changed cells
+        :return: ids of the clusters that were computed again
+        """
+        cells = np.asarray(cells).reshape(-1)
+        if not cells.size:
+            return []
+
+        self.transitions = self._find_transitions()
+        entrances = self._group_entrances()
+        dirty = {self.cluster(index) for index in cells.tolist()}
+        dirty.update(
+            cluster for cluster in range(self.cluster_count)
+            if entrances.get(cluster, []) != self.entrances.get(cluster, [])
+        )
+        for cluster in sorted(dirty):
+            self._build_cluster(cluster, entrances.get(cluster, []))
+        return sorted(dirty)
+
+    # pylint: disable=too-many-locals
+    def plan(
+        self, start: Position, goal: Position, heuristic_function: HeuristicFunction = manhattan_distance
+    ) -> list[Position]:
+        """
+        Plans a route on the abstract graph and refines it inside the clusters it crosses.
+
+        :param start: the start position
+        :param goal: the goal position
+        :param heuristic_function: heuristic of the search on the abstract graph
+        :return: the path from the start (excluded) to the goal, empty if no path is found
+        """
+        start_index = start[0] * self.cols + start[1]
+        goal_index = goal[0] * self.cols + goal[1]
+        if start_index == goal_index or self.norm_map[start] or self.norm_map[goal]:
+            return []
+
+        # The start and the goal are linked to the entrances of their clusters for this query only
+        start_cluster, goal_cluster = self.cluster(start_index), self.cluster(goal_index)
+        from_start = self._distances_from(start_cluster, [start_index])[0]
+        to_goal = self._distances_from(goal_cluster, [goal_index])[0]
+
+        def local(index: int) -> Position:
+            rows, cols = self.bounds(self.cluster(index))
+            row, col = divmod(index, self.cols)
+            return row - rows.start, col - cols.start
+
+        def neighbors(index: int) -> list[tuple[int, float]]:
+            moves = self.edges.get(index, []) + self.transitions.get(index, [])
+            if index == start_index:
+                moves += [(entrance, float(from_start[local(entrance)])) for entrance in self.entrances[start_cluster]]
+                if goal_cluster == start_cluster:
+                    moves.append((goal_index, float(from_start[local(goal_index)])))
+            if self.cluster(index) == goal_cluster:
+                moves.append((goal_index, float(to_goal[local(index)])))
+            return [(neighbor, cost) for neighbor, cost in moves if neighbor != index and cost != np.inf]
+
+        open_list = OpenList()
+        costs = {start_index: 0.0}
+        parents = {start_index: -1}
+        open_list.push(start_index, heuristic_function(start, goal))
+        while open_list:
+            current = open_list.pop()
+            if current == goal_index:
+                break
+            for neighbor, weight in neighbors(current):
+                cost = costs[current] + weight
+                if cost < costs.get(neighbor, np.inf):
+                    costs[neighbor] = cost
+                    parents[neighbor] = current
+                    open_list.push(neighbor, cost + heuristic_function(divmod(neighbor, self.cols), goal))
+        else:
+            return []
+
+        route = [goal_index]
+        while route[-1] != start_index:
+            route.append(parents[route[-1]])
+        route.reverse()
+
+        # Consecutive nodes in different clusters are a crossing, in the same cluster a walk down the distances
+        path: list[Position] = []
+        for current, following in zip(route, route[1:]):
+            cluster = self.cluster(current)
+            if cluster != self.cluster(following):
+                path.append(divmod(following, self.cols))
+                continue
+            if following == goal_index:
+                distance = to_goal
+            else:
+                distance = self.distances[cluster][self.entrances[cluster].index(following)]
+            rows, cols = self.bounds(cluster)
+            path += [
+                (row + rows.start, col + cols.start) for row, col in _descend(distance, *local(current), self.diagonal)
+            ]
+        return path
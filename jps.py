@@ -0,0 +1,215 @@
+"""
+This file contains Jump Point Search, which speeds up A* on grids with diagonal neighbors by pruning the
+symmetric paths and jumping across open space.
+
+It runs on the cost model of GridGraph shared with A*: straight moves cost STRAIGHT_WEIGHT and diagonal moves
+cost DIAGONAL_WEIGHT, both multiplied by cost_addition, and diagonal moves may cut the corners of obstacles.
+The pruning rules only discard neighbors that can be reached from the parent at most as cheaply without
+going through the current cell. With the diagonal weight at twice the straight weight, as in GridGraph, a cell
+is often reached at the same cost from several directions, and pruning by the direction of a single parent can
+drop the only successor on a shortest path, e.g. a diagonal move out of a cell first reached by a straight
+jump. Every direction a jump point is reached from at its lowest cost is therefore kept, and the cell is
+expanded again when a new one is found.
+"""
+# pylint: disable=duplicate-code
+from typing import Optional
+
+from grid import DIAGONAL_MOVES, DIAGONAL_WEIGHT, STRAIGHT_MOVES, STRAIGHT_WEIGHT, GridGraph
+from node import Position
+from search_stats import SearchStats
+import search
+import utils as util
+
+
+def _blocked(graph: GridGraph, row: int, col: int) -> bool:
+    """
+    return: True if the cell is an obstacle or outside of the grid
+    """
+    if row < 0 or col < 0 or row >= graph.rows or col >= graph.cols:
+        return True
+    return bool(graph.occupancy[row * graph.cols + col])
+
+
+def _directions(graph: GridGraph, row: int, col: int, d_row: int, d_col: int) -> list[Position]:
+    """
+    return: the directions of the natural and forced neighbors of the cell reached by moving (d_row, d_col)
+    """
+    if d_row and d_col:
+        directions = [(d_row, 0), (0, d_col), (d_row, d_col)]
+        if _blocked(graph, row - d_row, col):
+            directions.append((-d_row, d_col))
+        if _blocked(graph, row, col - d_col):
+            directions.append((d_row, -d_col))
+    elif d_col:
+        directions = [(0, d_col)]
+        if _blocked(graph, row - 1, col):
+            directions.append((-1, d_col))
+        if _blocked(graph, row + 1, col):
+            directions.append((1, d_col))
+    else:
+        directions = [(d_row, 0)]
+        if _blocked(graph, row, col - 1):
+            directions.append((d_row, -1))
+        if _blocked(graph, row, col + 1):
+            directions.append((d_row, 1))
+    return directions
+
+
+def _has_forced(graph: GridGraph, row: int, col: int, d_row: int, d_col: int) -> bool:
+    """
+    return: whether the cell reached by moving (d_row, d_col) has a traversable forced neighbor
+    """
+    if d_row and d_col:
+        return (
+            _blocked(graph, row - d_row, col) and not _blocked(graph, row - d_row, col + d_col)
+        ) or (
+            _blocked(graph, row, col - d_col) and not _blocked(graph, row + d_row, col - d_col)
+        )
+    if d_col:
+        return (
+            _blocked(graph, row - 1, col) and not _blocked(graph, row - 1, col + d_col)
+        ) or (
+            _blocked(graph, row + 1, col) and not _blocked(graph, row + 1, col + d_col)
+        )
+    return (
+        _blocked(graph, row, col - 1) and not _blocked(graph, row + d_row, col - 1)
+    ) or (
+        _blocked(graph, row, col + 1) and not _blocked(graph, row + d_row, col + 1)
+    )
+
+
+def _jump(graph: GridGraph, row: int, col: int, d_row: int, d_col: int) -> Optional[tuple[int, int, int]]:
+    """
+    Moves from the cell in the direction until a jump point, an obstacle or the edge of the grid.
+
+    return: the (row, column, number of steps) of the jump point, None if there is none in that direction
+    """
+    goal_row, goal_col = graph.goal
+    steps = 0
+    while True:
+        row += d_row
+        col += d_col
+        steps += 1
+        if _blocked(graph, row, col):
+            return None
+        if (row == goal_row and col == goal_col) or _has_forced(graph, row, col, d_row, d_col):
+            return row, col, steps
+        # A diagonal move stops where a straight jump along one of its components finds a jump point
+        if d_row and d_col and (
+            _jump(graph, row, col, d_row, 0) is not None or _jump(graph, row, col, 0, d_col) is not None
+        ):
+            return row, col, steps
+
+
+def _direction(graph: GridGraph, index: int, neighbor: int) -> Position:
+    """
+    return: the direction of the jump from the cell to the neighbor
+    """
+    row, col = graph.position(index)
+    neighbor_row, neighbor_col = graph.position(neighbor)
+    return (neighbor_row > row) - (neighbor_row < row), (neighbor_col > col) - (neighbor_col < col)
+
+
+def _fill(path: list[Position], start: Position) -> list[Position]:
+    """
+    return: the path through every cell between consecutive jump points, the start is excluded
+    """
+    cells: list[Position] = []
+    row, col = start
+    for next_row, next_col in path:
+        d_row = (next_row > row) - (next_row < row)
+        d_col = (next_col > col) - (next_col < col)
+        while (row, col) != (next_row, next_col):
+            row += d_row
+            col += d_col
+            cells.append((row, col))
+    return cells
+
+
+# pylint: disable=too-many-locals
+def _successors(graph: GridGraph, index: int, arrivals: Optional[set[Position]]) -> list[tuple[int, float]]:
+    """
+    return: the jump points reached from the cell, in the directions left by the pruning of the directions it was
+    reached from, or in every direction for the start, and the weight of the jump to each of them
+    """
+    row, col = graph.position(index)
+    if arrivals is None:
+        directions = STRAIGHT_MOVES + DIAGONAL_MOVES
+    else:
+        directions = list(dict.fromkeys(
+            direction for d_row, d_col in sorted(arrivals) for direction in _directions(graph, row, col, d_row, d_col)
+        ))
+
+    successors: list[tuple[int, float]] = []
+    for d_row, d_col in directions:
+        jump_point = _jump(graph, row, col, d_row, d_col)
+        if jump_point is None:
+            continue
+
+        jump_row, jump_col, steps = jump_point
+        weight = DIAGONAL_WEIGHT if d_row and d_col else STRAIGHT_WEIGHT
+        successors.append((jump_row * graph.cols + jump_col, weight * steps))
+    return successors
+
+
+def jump_point_search(
+    graph: GridGraph, start: Position, depth_limit: int = 50, stats: Optional[SearchStats] = None
+) -> list[Position]:
+    """
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
+    :param depth_limit: the depth limit of the search
+    :param stats: the counters to fill in, the search is not instrumented without them
+    Returns: a list of nodes that represents the path from the start node to the end node, through every cell
+    """
+    # Jump points are only defined on the 8 connected grid
+    if not graph.diagonal_neighbors:
+        return search.a_star(graph, start, depth_limit, stats)
+
+    open_list, depth = util.initialize_algorithm(graph, start)
+    start_index = graph.index(start)
+    path: Optional[list[Position]] = None
+    # Directions every jump point was reached from at its lowest cost, and those it was already expanded for
+    arrivals: dict[int, set[Position]] = {}
+    expanded: dict[int, set[Position]] = {}
+
+    def successors(index: int) -> list[tuple[int, float]]:
+        if index == start_index:
+            return _successors(graph, index, None)
+        directions = arrivals[index] - expanded.setdefault(index, set())
+        expanded[index] |= directions
+        return _successors(graph, index, directions)
+
+    while open_list and depth < depth_limit:
+        depth += 1
+
+        current_index = open_list.pop()
+        graph.mark_visited(current_index)
+
+        if current_index == graph.goal_index:
+            path = _fill(util.backtrack(graph, current_index, start), start)
+            break
+
+        if stats is None:
+            jump_points = successors(current_index)
+        else:
+            jump_points = stats.expand(current_index, successors, len(open_list))
+        for neighbor, weight in jump_points:
+            cost = graph.g[current_index] + graph.cost_addition * weight
+            direction = _direction(graph, current_index, neighbor)
+            if cost < graph.cost(neighbor):
+                arrivals[neighbor] = {direction}
+                expanded[neighbor] = set()
+                util.open_neighbor(graph, open_list, neighbor, cost, current_index, stats)
+            elif cost == graph.cost(neighbor) and neighbor != start_index and direction not in arrivals[neighbor]:
+                # Reached at the same cost from a new direction, which can leave other successors after pruning
+                arrivals[neighbor].add(direction)
+                if neighbor not in open_list:
+                    if stats is not None and graph.is_visited(neighbor):
+                        stats.reopenings += 1
+                    open_list.push(neighbor, graph.f[neighbor])
+
+    # The path is empty if it is not found
+    if stats is not None:
+        stats.record(open_list, depth, depth_limit, path is not None)
+    return path or []
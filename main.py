@@ -1,23 +1,43 @@
 """
 The entrypoint for the project.
+
+Pass --headless to plan on a synthetic scene, or --headless=scene.npz to replay a recorded scene, instead of
+connecting to CoppeliaSim.
+
+Pass --plan-cache to read back the routes planned by earlier runs on the same map from .plan_cache, or
+--plan-cache=DIR from another directory, instead of searching again. Without it the search always runs.
 """
 import sys
-from typing import Optional
 import tracemalloc
 import time
+from typing import Any
 
-from coppeliasim_zmqremoteapi_client import RemoteAPIClient  # type: ignore
-
-from node import HeuristicFunction, Node
+from headless_sim import HeadlessSim, synthetic_scene
+from map_cache import MapCache
+from plan_cache import PlanCache
+from planner import ALGORITHM_NAMES, Planner
+from search_stats import SearchStats
 import heuristic
-import search
 import utils as util
 
 # pylint: disable=invalid-name
-# This part is from assignment2_part1.py from the homework
-# if __name__ == "__main__":
-client = RemoteAPIClient()
-sim = client.getObject("sim")
+headless = [arg for arg in sys.argv[1:] if arg.split("=")[0] == "--headless"]
+plan_cache_args = [arg for arg in sys.argv[1:] if arg.split("=")[0] == "--plan-cache"]
+sys.argv = [arg for arg in sys.argv if arg not in headless and arg not in plan_cache_args]
+
+sim: Any
+if headless:
+    scene = headless[-1].partition("=")[2]
+    sim = HeadlessSim.load(scene) if scene else synthetic_scene()
+else:
+    # The ZMQ client is only needed, and only imported, to talk to a running simulator
+    # pylint: disable=import-outside-toplevel
+    from coppeliasim_zmqremoteapi_client import RemoteAPIClient  # type: ignore
+
+    # This part is from assignment2_part1.py from the homework
+    # if __name__ == "__main__":
+    client = RemoteAPIClient()
+    sim = client.getObject("sim")
 
 
 trackpoint = sim.getObjectHandle("/track_point")  # pylint: disable=no-member
@@ -32,14 +52,15 @@ start_world = sim.getObjectPosition(robot, sim.handle_world)  # pylint: disable=
 sim.setObjectPosition(trackpoint, start_world)  # pylint: disable=no-member
 
 worldmap = util.GridMap(sim, 5.0)
-worldmap.inflate_obstacles(num_iter=7)
-worldmap.normalize_map()
+# The obstacles are inflated by a threshold of their distance transform, and both are skipped when the same
+# scene was processed by an earlier run
+worldmap.preprocess(MapCache(), radius=7)
 
 goal_grid = worldmap.get_grid_coords(goal_world)
 start_grid = worldmap.get_grid_coords(start_world)
 
 start = tuple(start_grid)[::-1]
-Node.end_coordinate = tuple(goal_grid)[::-1]
+end = tuple(goal_grid)[::-1]
 
 algorithm = None
 heuristic_choice = None
@@ -56,55 +77,40 @@ except IndexError:
     print("Not all arguments so using some default values.")
     print(f'Depth limit = {depth_limit}')
 
-heuristic_func: Optional[HeuristicFunction] = None
-
-match algorithm:
-    case "a_star":
-        search_func = search.a_star
-    case 'greedy_first':
-        Node.cost_addition = 0
-        search_func = search.a_star
-    case 'beam':
-        search_func = search.beam
-        search.beam_frontier_size = frontier_size
-        Node.cost_addition = 0
-    case 'djikstra':
-        search_func = search.djikstra
-    case _:
-        print("Using default search A*.")
-        search_func = search.a_star
-
-if heuristic_func:
+if algorithm not in ALGORITHM_NAMES:
+    print("Using default search A*.")
+    algorithm = "a_star"
+
+if algorithm == 'djikstra':
     print("Chosen Djikstra so no heuristic function.")
-else:
-    match heuristic_choice:
-        case 'manhattan':
-            heuristic_func = heuristic.manhattan_distance
-        case 'euclidean':
-            heuristic_func = heuristic.euclidean_distance
-        case 'chebyshev':
-            heuristic_func = heuristic.chebyshev_distance
-        case 'octile':
-            heuristic_func = heuristic.octile_distance
-        case 'bozo':
-            heuristic_func = heuristic.bozo_distance
-        case _:
-            print("Using default heuristic manhattan distance.")
-            heuristic_func = heuristic.manhattan_distance
-
-Node.worldmap_reference = worldmap.world_to_nodes(heuristic_func)
-assert Node.worldmap_reference is not None
-
-Node.diagonal_neighbors = diagonal_neighbors
+    heuristic_choice = "manhattan"  # Not used by the search
+elif heuristic_choice not in heuristic.HEURISTICS:
+    print("Using default heuristic manhattan distance.")
+    heuristic_choice = "manhattan"
+
+# With --plan-cache, routes planned by an earlier run on the same map are read back instead of searched again
+plan_cache_directory = (plan_cache_args[-1].partition("=")[2] or ".plan_cache") if plan_cache_args else None
+plan_cache = PlanCache(directory=plan_cache_directory)
+planner = Planner(worldmap.norm_map, plan_cache)
 
 tracemalloc.start()
 start_time = time.perf_counter_ns()
 
 print("Starting search.")
-path = search_func(start, depth_limit)
+stats = SearchStats()
+path = planner.plan(
+    start, end, algorithm, heuristic_choice, diagonal_neighbors, depth_limit, stats, beam_width=frontier_size
+)
 print("Search complete")
+if plan_cache.hits:
+    print("Path served from the plan cache, the search did not run.")
 
 print(f"Time to Run (ms): {(time.perf_counter_ns() - start_time) / 10 ** 6}")
+print(f"Nodes expanded: {stats.expansions}, reopened: {stats.reopenings}")
+print(f"Open list pushes: {stats.pushes}, stale pops: {stats.stale_pops}, largest size: {stats.max_open_size}")
+print(f"Time generating neighbors (ms): {stats.neighbor_seconds * 1000}")
+if stats.depth_limit_reached:
+    print(f"Depth limit of {depth_limit} reached.")
 
 snapshot = tracemalloc.take_snapshot()
 allocs = sum(stat.size for stat in snapshot.statistics('lineno'))
@@ -119,4 +125,6 @@ if not path:
 trace_world = worldmap.get_world_coords(path)
 coppelia_path = util.generate_path_from_trace(sim, trace_world, 100)
 
-util.execute_path(coppelia_path, sim, trackpoint, robot, thresh=0.1)
+# The headless scene is stepped so the robot drives as fast as the follower polls it
+report = util.execute_path(coppelia_path, sim, trackpoint, robot, thresh=0.1, stepping=bool(headless))
+print(f"Path followed with {report.round_trips} round trips, {report.round_trips_per_meter:.1f} per meter")
@@ -0,0 +1,122 @@
+"""
+This file contains the MapCache class, the on-disk cache of the processed grid maps that lets a run on an
+unchanged scene skip the inflation and normalization of the captured image.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Any, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from distance_field import DistanceField
+from grid import GridGraph
+from node import Position
+from wavefront import wavefront_field
+
+
+class MapCache:
+    """
+    Directory of processed maps, one subdirectory of .npy files per key.
+
+    Arrays are opened with mmap_mode, so the processes that load the same map share its pages through the page
+    cache instead of each holding a private copy. The default copy-on-write mode keeps the files unchanged when
+    a loaded map is written to, e.g. by Planner.update_map, and only the written pages are copied.
+    """
+
+    def __init__(self, directory: str = ".map_cache", mmap_mode: str = "c"):
+        """
+        Parameters
+        ----------
+        directory : str, optional
+            directory of the cache, created when the first map is stored
+        mmap_mode : str, optional
+            mode the arrays are opened with, see numpy.load
+        """
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(raw_image: npt.NDArray[Any], world_size: float, **parameters: Any) -> str:
+        """
+        Parameters
+        ----------
+        raw_image : numpy.ndarray
+            image captured from the vision sensor, before any processing
+        world_size : float
+            size of the world covered by the image
+        parameters :
+            parameters of the processing, e.g. those of GridMap.inflate_obstacles, arrays are hashed by value
+
+        Returns
+        -------
+        str
+            hexadecimal digest that changes with the image, the world size or any parameter
+        """
+        digest = hashlib.sha256()
+        image = np.ascontiguousarray(raw_image)
+        digest.update(f"{image.shape}{image.dtype.str}{world_size!r}".encode())
+        digest.update(image.tobytes())
+        for name in sorted(parameters):
+            value = parameters[name]
+            if isinstance(value, np.ndarray):
+                value = (value.shape, value.dtype.str, value.tobytes())
+            digest.update(f"{name}={value!r};".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str, name: str) -> str:
+        """
+        return: the file of the array stored under the name for the key
+        """
+        return os.path.join(self.directory, key, f"{name}.npy")
+
+    def load(self, key: str, name: str) -> Optional[npt.NDArray[Any]]:
+        """
+        return: the memory mapped array stored under the name for the key, None if it is not cached
+        """
+        path = self._path(key, name)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        array: npt.NDArray[Any] = np.load(path, mmap_mode=self.mmap_mode)  # type: ignore[arg-type]
+        return array
+
+    def store(self, key: str, name: str, array: npt.NDArray[Any]) -> None:
+        """
+        Writes the array under the name for the key. The file is written next to its final path and renamed,
+        so a process loading the same key never sees a partial file.
+        """
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(suffix=".npy", dir=os.path.join(self.directory, key))
+        with os.fdopen(descriptor, "wb") as file:
+            np.save(file, np.asarray(array))
+        os.replace(temporary, self._path(key, name))
+
+    def distance_field(
+        self, key: str, graph: GridGraph, goal: Position, diagonal_neighbors: bool = False
+    ) -> DistanceField:
+        """
+        return: the distance field of the goal on the map of the key, computed on the graph if it is not cached
+        """
+        suffix = f"{goal[0]}_{goal[1]}_{int(diagonal_neighbors)}"
+        distance = self.load(key, f"distance_{suffix}")
+        successor = self.load(key, f"successor_{suffix}")
+        if distance is not None and successor is not None:
+            graph.reset(goal, graph.heuristic_function, diagonal_neighbors, lazy_heuristic=True)
+            return DistanceField(graph, distance, successor)
+
+        field = wavefront_field(graph, goal, diagonal_neighbors)
+        self.store(key, f"successor_{suffix}", field.successor)
+        self.store(key, f"distance_{suffix}", field.distance)
+        return field
+
+    def clear(self) -> None:
+        """
+        Deletes every cached map.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,196 @@
+"""
+This file contains the vectorized morphological dilation used to inflate the obstacles of the grid by the
+footprint of the robot, and the Euclidean distance transform that gives the clearance of every cell.
+"""
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+# The 8 moves of a single inflation pass of GridMap.inflate_obstacles (the cell itself is not included)
+NEIGHBOR_KERNEL: npt.NDArray[np.bool_] = np.array(
+    [[True, True, True], [True, False, True], [True, True, True]]
+)
+
+
+def square_kernel(radius: int) -> npt.NDArray[np.bool_]:
+    """
+    :param radius: half width of the square in cells
+    :return: a (2 * radius + 1) square structuring element
+    """
+    return np.ones((2 * radius + 1, 2 * radius + 1), dtype=bool)
+
+
+def disk_kernel(radius: float) -> npt.NDArray[np.bool_]:
+    """
+    :param radius: radius of the robot footprint in cells
+    :return: a round structuring element containing every cell whose center is within radius
+    """
+    half = int(np.floor(radius))
+    rows, cols = np.ogrid[-half:half + 1, -half:half + 1]
+    return np.asarray(rows ** 2 + cols ** 2 <= radius ** 2)
+
+
+def _dilate_runs(mask: npt.NDArray[np.bool_], start: int, stop: int) -> npt.NDArray[np.bool_]:
+    """
+    Dilates every row of the mask by the horizontal run of offsets [start, stop] in O(cells).
+
+    :return: cells that have a True cell at a column offset in [start, stop]
+    """
+    cols = mask.shape[1]
+    prefix = np.zeros((mask.shape[0], cols + 1), dtype=np.int32)
+    np.cumsum(mask, axis=1, out=prefix[:, 1:])
+
+    # Window of columns [j + start, j + stop] clipped to the grid
+    columns = np.arange(cols)
+    lower = np.clip(columns + start, 0, cols)
+    upper = np.clip(columns + stop + 1, 0, cols)
+    return np.asarray(prefix[:, upper] - prefix[:, lower] > 0)
+
+
+def _shift_rows(mask: npt.NDArray[np.bool_], offset: int) -> npt.NDArray[np.bool_]:
+    """
+    :return: the mask moved by offset rows, so that out[row] = mask[row + offset] and rows outside are False
+    """
+    if offset == 0:
+        return mask
+    shifted = np.zeros_like(mask)
+    if offset > 0:
+        shifted[:-offset] = mask[offset:]
+    else:
+        shifted[-offset:] = mask[:offset]
+    return shifted
+
+
+def dilate(mask: npt.NDArray[Any], kernel: npt.NDArray[Any]) -> npt.NDArray[np.bool_]:
+    """
+    Marks every cell reached from a True cell of the mask by one of the offsets of the kernel.
+
+    The kernel is split into horizontal runs of True cells, and each run is applied to all the rows at once
+    with a sliding window sum, so the cost is linear in the number of cells times the number of runs. A full
+    square kernel is separable and done in two linear passes.
+
+    :param mask: 2D boolean array of the cells to dilate (obstacles)
+    :param kernel: 2D boolean structuring element with odd dimensions, centered on the middle cell
+    :return: the dilated mask
+    """
+    mask = np.asarray(mask, dtype=bool)
+    kernel = np.asarray(kernel, dtype=bool)
+    half_rows, half_cols = kernel.shape[0] // 2, kernel.shape[1] // 2
+
+    if kernel.all():
+        rows_dilated = _dilate_runs(mask.T, -half_rows, half_rows).T
+        return _dilate_runs(rows_dilated, -half_cols, half_cols)
+
+    dilated = np.zeros_like(mask)
+    for k_row in range(kernel.shape[0]):
+        # Boundaries of the runs of True cells in this row of the kernel
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], kernel[k_row].astype(np.int8), [0]))))
+        if edges.size == 0:
+            continue
+        # A True cell at offset (d_row, d_col) marks the cell at mask + (d_row, d_col)
+        shifted = _shift_rows(mask, half_rows - k_row)
+        for run_start, run_stop in zip(edges[::2], edges[1::2]):
+            dilated |= _dilate_runs(shifted, half_cols - int(run_stop) + 1, half_cols - int(run_start))
+    return dilated
+
+
+def inflate(
+    grid: npt.NDArray[Any],
+    num_iter: int = 1,
+    obs_thresh: int = 100,
+    infl_val: int = 99,
+    kernel: npt.NDArray[Any] = NEIGHBOR_KERNEL,
+) -> npt.NDArray[Any]:
+    """
+    Inflates the obstacles of a grayscale grid.
+
+    Each pass sets every cell reached by the kernel from a cell darker than obs_thresh to infl_val, which is
+    what the per cell loop of GridMap.inflate_obstacles used to do with the 8 moves.
+
+    :param grid: 2D grayscale image, obstacles are darker than obs_thresh
+    :param num_iter: number of inflation passes
+    :param obs_thresh: gray level under which a cell is an obstacle
+    :param infl_val: gray level given to inflated cells
+    :param kernel: structuring element of a single pass
+    :return: the inflated grid, the input is not modified
+    """
+    inflated = np.copy(grid)
+    for _ in range(num_iter):
+        inflated[dilate(inflated < obs_thresh, kernel)] = infl_val
+    return inflated
+
+
+def _column_distances(mask: npt.NDArray[np.bool_], far: float) -> npt.NDArray[np.float64]:
+    """
+    :return: the squared distance from every cell to the closest True cell of its column, far without one
+    """
+    rows = np.arange(mask.shape[0])[:, None]
+    above = np.maximum.accumulate(np.where(mask, rows, -1), axis=0)
+    below = np.minimum.accumulate(np.where(mask, rows, mask.shape[0])[::-1], axis=0)[::-1]
+    distance = np.full(mask.shape, far)
+    np.minimum(distance, np.where(above >= 0, rows - above, far).astype(float) ** 2, out=distance)
+    np.minimum(distance, np.where(below < mask.shape[0], below - rows, far).astype(float) ** 2, out=distance)
+    return distance
+
+
+# pylint: disable=too-many-locals
+def _lower_envelope(squared: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """
+    Computes min over j of squared[row, j] + (col - j) ** 2 for every cell, with the lower envelope of parabolas
+    of Felzenszwalb and Huttenlocher. The envelopes of all the rows are built at once, one column at a time.
+
+    :param squared: 2D array of squared distances along the columns
+    :return: the squared Euclidean distances
+    """
+    rows, cols = squared.shape
+    every_row = np.arange(rows)
+    # Columns of the parabolas of the envelope of every row, and the boundaries between them
+    vertex = np.zeros((rows, cols), dtype=np.intp)
+    boundary = np.full((rows, cols + 1), np.inf)
+    boundary[:, 0] = -np.inf
+    top = np.zeros(rows, dtype=np.intp)
+    intersection = np.empty(rows)
+
+    for col in range(1, cols):
+        height = squared[:, col] + col * col
+        pending = every_row
+        # Parabolas hidden by the new one are popped, a different number of them in every row
+        while pending.size:
+            last = vertex[pending, top[pending]]
+            crossing = (height[pending] - squared[pending, last] - last * last) / (2 * (col - last))
+            hidden = crossing <= boundary[pending, top[pending]]
+            intersection[pending[~hidden]] = crossing[~hidden]
+            pending = pending[hidden]
+            top[pending] -= 1
+        top += 1
+        vertex[every_row, top] = col
+        boundary[every_row, top] = intersection
+        boundary[every_row, top + 1] = np.inf
+
+    distance = np.empty_like(squared)
+    top.fill(0)
+    for col in range(cols):
+        while True:
+            passed = boundary[every_row, top + 1] < col
+            if not passed.any():
+                break
+            top[passed] += 1
+        nearest = vertex[every_row, top]
+        distance[:, col] = (col - nearest) ** 2 + squared[every_row, nearest]
+    return distance
+
+
+def distance_transform(mask: npt.NDArray[Any]) -> npt.NDArray[np.float64]:
+    """
+    Exact Euclidean distance transform, computed as the squared distances along the columns followed by the
+    lower envelope along the rows, both linear in the number of cells.
+
+    :param mask: 2D boolean array of the cells to measure the distance to (obstacles)
+    :return: the distance in cells from every cell to the closest True cell, 0 on them, infinity without any
+    """
+    mask = np.asarray(mask, dtype=bool)
+    # Larger than any squared distance inside the grid
+    far = float(mask.shape[0] ** 2 + mask.shape[1] ** 2 + 1)
+    squared = _lower_envelope(_column_distances(mask, far))
+    return np.where(squared >= far, np.inf, np.sqrt(squared))
@@ -0,0 +1,97 @@
+"""
+This file contains the OpenList class, the priority queue of cells waiting to be expanded by the searches.
+"""
+import heapq
+import math
+from typing import Any, TypeAlias
+
+# A number, or a tuple of numbers compared lexicographically (the keys of D* Lite), never mixed in one list
+Priority: TypeAlias = Any
+
+
+class OpenList:
+    """
+    Binary heap of cell ids ordered by priority.
+
+    Equal priorities are popped in insertion order. Pushing a cell that is already in the list replaces its
+    priority (decrease-key): the previous heap entry is left in place and skipped when it is popped (lazy
+    deletion). The counters of pushes, pops and stale pops are kept across clear().
+    """
+
+    def __init__(self) -> None:
+        self.heap: list[tuple[Priority, int, int]] = []
+        # Insertion number of the live entry of every cell in the list
+        self.entries: dict[int, int] = {}
+        self.counter = 0
+
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+
+    def __len__(self) -> int:
+        """
+        return: the number of cells in the list
+        """
+        return len(self.entries)
+
+    def __contains__(self, index: object) -> bool:
+        """
+        return: whether the cell is in the list
+        """
+        return index in self.entries
+
+    @property
+    def expansions(self) -> int:
+        """
+        return: the number of cells popped, stale entries excluded
+        """
+        return self.pops - self.stale_pops
+
+    def push(self, index: int, priority: Priority) -> None:
+        """
+        Adds the cell to the list, or moves it to the new priority if it is already in it.
+        """
+        self.counter += 1
+        self.entries[index] = self.counter
+        heapq.heappush(self.heap, (priority, self.counter, index))
+        self.pushes += 1
+
+    def pop(self) -> int:
+        """
+        return: the cell with the lowest priority, which is removed from the list
+        """
+        while self.heap:
+            _, count, index = heapq.heappop(self.heap)
+            self.pops += 1
+            if self.entries.get(index) != count:
+                self.stale_pops += 1
+                continue
+            del self.entries[index]
+            return index
+        raise IndexError("pop from an empty OpenList")
+
+    def peek(self) -> Priority:
+        """
+        return: the lowest priority in the list, infinity if it is empty
+        """
+        while self.heap:
+            priority, count, index = self.heap[0]
+            if self.entries.get(index) == count:
+                return priority
+            heapq.heappop(self.heap)
+            self.pops += 1
+            self.stale_pops += 1
+        return math.inf
+
+    def remove(self, index: int) -> None:
+        """
+        Removes the cell from the list if it is in it, its heap entry becomes stale.
+        """
+        self.entries.pop(index, None)
+
+    def clear(self) -> None:
+        """
+        Removes every cell from the list.
+        """
+        self.heap.clear()
+        self.entries.clear()
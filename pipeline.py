@@ -0,0 +1,302 @@
+"""
+This file contains the asyncio pipeline, which captures the map, plans and follows the path as concurrent stages
+connected by queues, so the robot starts driving on a first path while better paths and new maps are computed.
+
+The calls to the simulator are made by one worker thread, since the ZMQ client must not be used by several
+threads at once, and the planning runs in another executor. Run it to compare the time from the start of a
+headless scene to the robot reaching the goal with the sequential steps of main.py.
+
+Usage: python pipeline.py [--scenes 5] [--seed 0] [--real-time-factor 4]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import functools
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+from headless_sim import GOAL, ROBOT, TRACKPOINT, synthetic_scene
+from node import Position
+from planner import Planner
+from utils import FollowReport, GridMap, PathFollower, Simulator, execute_path, generate_path_from_trace
+import ara
+
+_Result = TypeVar('_Result')
+
+
+@dataclass
+class PipelineSettings:
+    """
+    Parameters of a run, shared by the pipeline and the sequential run it is compared with.
+    """
+    # pylint: disable=too-many-instance-attributes
+    world_size: float = 5.0
+    radius: float = 7.0
+    heuristic: str = 'manhattan'
+    diagonal: bool = False
+    # Seconds ARA* keeps improving the path on every map
+    budget: float = 1.0
+    # Seconds between two captures of the map, the map is captured once without it
+    recapture_period: Optional[float] = None
+    poll_period: float = 0.05
+    thresh: float = 0.1
+    # Algorithm of the sequential run, as given to Planner.plan
+    algorithm: str = 'a_star'
+
+
+@dataclass
+class RunReport:
+    """
+    Time from the start of the scene to the robot reaching the goal, and the work done on the way.
+    """
+    reached: bool = False
+    seconds: float = 0.0
+    first_path_seconds: float = 0.0
+    captures: int = 0
+    plans: int = 0
+    path_switches: int = 0
+    follow: FollowReport = field(default_factory=FollowReport)
+
+
+def _cell(worldmap: GridMap, world_position: list[float]) -> Position:
+    """
+    return: the (row, column) cell of the world position
+    """
+    col, row = worldmap.get_grid_coords(world_position)
+    return int(row), int(col)
+
+
+class Pipeline:
+    """
+    Runs the capture, planning and following stages of one scene as asyncio tasks.
+
+    The capture stage puts every processed map in a queue. The planning stage runs one ARA* search per map
+    from the current position of the robot, and its callback hands every better path to the following stage
+    as soon as it is found, so the robot starts on the first weighted path while the search keeps improving it
+    until the budget runs out. The following stage polls the robot and switches to the newest path between two
+    polls. Both queues only hold the newest item.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, sim: Simulator, settings: Optional[PipelineSettings] = None):
+        """
+        Parameters
+        ----------
+        sim : Simulator
+            the sim object of the scene, only called from the simulator thread
+        settings : PipelineSettings, optional
+            parameters of the run
+        """
+        self.sim = sim
+        self.settings = settings or PipelineSettings()
+        self.report = RunReport()
+        self.sim_executor = ThreadPoolExecutor(1, thread_name_prefix="sim")
+        self.compute_executor = ThreadPoolExecutor(2, thread_name_prefix="compute")
+        self.maps: asyncio.Queue[GridMap] = asyncio.Queue(maxsize=1)
+        # World coordinates of the path for the follower, None when no path is found
+        self.paths: asyncio.Queue[Optional[npt.NDArray[Any]]] = asyncio.Queue(maxsize=1)
+        self.begin = 0.0
+
+    async def _call_sim(self, function: Callable[..., _Result], *args: Any) -> _Result:
+        """
+        return: the result of the function, called in the simulator thread
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.sim_executor, function, *args)
+
+    async def _compute(self, function: Callable[..., _Result], *args: Any) -> _Result:
+        """
+        return: the result of the function, called in a compute thread
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.compute_executor, function, *args)
+
+    @staticmethod
+    def _put_newest(queue: 'asyncio.Queue[Any]', item: Any) -> None:
+        """
+        Puts the item in the queue of size one, dropping the item that was not taken yet.
+        """
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def capture(self) -> None:
+        """
+        Captures and processes the map, then again every recapture_period seconds.
+        """
+        while True:
+            worldmap = await self._call_sim(GridMap, self.sim, self.settings.world_size)
+            await self._compute(functools.partial(worldmap.preprocess, radius=self.settings.radius))
+            self._put_newest(self.maps, worldmap)
+            self.report.captures += 1
+            if self.settings.recapture_period is None:
+                return
+            await asyncio.sleep(self.settings.recapture_period)
+
+    def _publish(
+        self, loop: asyncio.AbstractEventLoop, worldmap: GridMap, path: list[Position], _bound: float
+    ) -> None:
+        """
+        Hands a path found by the planning thread to the follower, for Planner.plan_anytime.
+        """
+        self.report.plans += 1
+        loop.call_soon_threadsafe(self._put_newest, self.paths, worldmap.get_world_coords(path))
+
+    async def plan(self) -> None:
+        """
+        Plans from the robot to the goal with ARA* on every map, handing over every better path as soon as it is
+        found.
+        """
+        robot = await self._call_sim(self.sim.getObjectHandle, ROBOT)
+        goal = await self._call_sim(self.sim.getObjectHandle, GOAL)
+        goal_world = await self._call_sim(self.sim.getObjectPosition, goal, self.sim.handle_world)
+
+        worldmap = await self.maps.get()
+        planner = Planner(np.array(worldmap.norm_map))
+        while True:
+            robot_world = await self._call_sim(self.sim.getObjectPosition, robot, self.sim.handle_world)
+            path, _ = await self._compute(
+                planner.plan_anytime, _cell(worldmap, robot_world), _cell(worldmap, goal_world),
+                self.settings.budget, self.settings.heuristic, self.settings.diagonal, ara.ARA_WEIGHT, None,
+                functools.partial(self._publish, asyncio.get_running_loop(), worldmap),
+            )
+            if not path:
+                self._put_newest(self.paths, None)
+            worldmap = await self.maps.get()
+            planner.update_map(worldmap.norm_map)
+
+    async def follow(self) -> bool:
+        """
+        Drives the robot along the newest path until it reaches the end of it.
+
+        return: whether the robot reached the end of a path, False if no path is found
+        """
+        trackpoint = await self._call_sim(self.sim.getObjectHandle, TRACKPOINT)
+        robot = await self._call_sim(self.sim.getObjectHandle, ROBOT)
+        follower = await self._call_sim(PathFollower, self.sim, trackpoint, robot, self.settings.thresh)
+        self.report.follow = follower.report
+
+        trace = await self.paths.get()
+        if trace is None:
+            return False
+        self.report.first_path_seconds = time.perf_counter() - self.begin
+        follower.set_path(await self._call_sim(generate_path_from_trace, self.sim, trace, 100))
+        while True:
+            if not self.paths.empty():
+                trace = self.paths.get_nowait()
+                if trace is None:
+                    return False
+                # The path was planned from where the robot was when the search started
+                follower.set_path(await self._call_sim(generate_path_from_trace, self.sim, trace, 100), join=True)
+                self.report.path_switches += 1
+            if not await self._call_sim(follower.advance):
+                if self.paths.empty():
+                    return True
+                continue
+            await asyncio.sleep(self.settings.poll_period)
+            await self._call_sim(follower.read_position)
+
+    async def run(self) -> RunReport:
+        """
+        Runs the stages until the robot reaches the goal, or no path is found.
+
+        return: the report of the run
+        """
+        self.begin = time.perf_counter()
+        stages = [asyncio.create_task(self.capture()), asyncio.create_task(self.plan())]
+        following = asyncio.create_task(self.follow())
+        try:
+            while not following.done():
+                finished, _ = await asyncio.wait([following, *stages], return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    stages = [stage for stage in stages if stage is not task]
+                    # A stage that failed stops the run, the capture stage returns once without recapture
+                    if task is not following and task.exception() is not None:
+                        raise task.exception()  # type: ignore[misc]
+            self.report.reached = following.result()
+        finally:
+            for task in [following, *stages]:
+                task.cancel()
+            await asyncio.gather(following, *stages, return_exceptions=True)
+            self.sim_executor.shutdown(cancel_futures=True)
+            self.compute_executor.shutdown(cancel_futures=True)
+        self.report.seconds = time.perf_counter() - self.begin
+        return self.report
+
+
+def run_pipeline(sim: Simulator, settings: Optional[PipelineSettings] = None) -> RunReport:
+    """
+    return: the report of the scene driven by a Pipeline
+    """
+    return asyncio.run(Pipeline(sim, settings).run())
+
+
+def run_sequential(sim: Simulator, settings: Optional[PipelineSettings] = None) -> RunReport:
+    """
+    Drives the scene with the steps of main.py one after the other: capture, inflate, plan, follow.
+
+    return: the report of the run
+    """
+    settings = settings or PipelineSettings()
+    report = RunReport()
+    begin = time.perf_counter()
+    robot = sim.getObjectHandle(ROBOT)
+    goal_world = sim.getObjectPosition(sim.getObjectHandle(GOAL), sim.handle_world)
+
+    worldmap = GridMap(sim, settings.world_size)
+    worldmap.preprocess(radius=settings.radius)
+    report.captures += 1
+    path = Planner(worldmap.norm_map).plan(
+        _cell(worldmap, sim.getObjectPosition(robot, sim.handle_world)),
+        _cell(worldmap, goal_world),
+        settings.algorithm,
+        settings.heuristic,
+        settings.diagonal,
+    )
+    report.plans += 1
+    if path:
+        report.first_path_seconds = time.perf_counter() - begin
+        coppelia_path = generate_path_from_trace(sim, worldmap.get_world_coords(path), 100)
+        trackpoint = sim.getObjectHandle(TRACKPOINT)
+        report.follow = execute_path(coppelia_path, sim, trackpoint, robot, settings.thresh, settings.poll_period)
+        report.reached = True
+    report.seconds = time.perf_counter() - begin
+    return report
+
+
+def main() -> None:
+    """
+    Compares the sequential run and the pipeline on synthetic headless scenes.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenes', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--resolution', type=int, default=512)
+    parser.add_argument('--real-time-factor', type=float, default=4.0, help='simulated seconds per second')
+    args = parser.parse_args()
+
+    totals = {'sequential': 0.0, 'pipeline': 0.0}
+    for seed in range(args.seed, args.seed + args.scenes):
+        runs: dict[str, Callable[[Any], RunReport]] = {'sequential': run_sequential, 'pipeline': run_pipeline}
+        reports = {
+            name: run(synthetic_scene(args.resolution, seed=seed, real_time_factor=args.real_time_factor))
+            for name, run in runs.items()
+        }
+        for name, report in reports.items():
+            totals[name] += report.seconds
+            print(
+                f"scene {seed} {name}: goal {'reached' if report.reached else 'not reached'} in "
+                f"{report.seconds:.2f} s, first path after {report.first_path_seconds:.2f} s, "
+                f"{report.follow.distance:.2f} m driven, {report.plans} plans, {report.path_switches} path switches"
+            )
+    print(
+        f"total: sequential {totals['sequential']:.2f} s, pipeline {totals['pipeline']:.2f} s, "
+        f"{totals['pipeline'] / totals['sequential'] - 1:+.0%} end to end"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+This file contains the PlanCache class, which keeps the paths of recent queries so a route that is planned again,
+e.g. from the dock to a station, is answered without a search.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Any, Hashable, Optional, TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+from node import Position
+
+# Fingerprint of the map, goal and parameters of the search that change the path, e.g. algorithm and heuristic
+Route: TypeAlias = tuple[str, Position, tuple[Hashable, ...]]
+
+
+class PlanCache:
+    """
+    Bounded least recently used cache of the paths found on a map, keyed by the fingerprint of the map, the start,
+    the goal and the parameters of the search, with an optional directory the paths are also written to.
+
+    The directory keeps at most disk_capacity paths, the files read or written the longest time ago are deleted
+    first.
+
+    A query whose start lies on a cached path to the same goal, with the same map and parameters, is answered by
+    the rest of that path. The rest of a shortest path is a shortest path, and with the other algorithms it is a
+    valid path, though not always the one their search would have found. Paths are only cached when one was
+    found, the reachability index of the planner already answers the queries without a path.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, capacity: int = 256, directory: Optional[str] = None, disk_capacity: int = 4096):
+        """
+        Parameters
+        ----------
+        capacity : int, optional
+            maximum number of paths kept in memory
+        directory : str, optional
+            directory the paths are written to and read from when they are not in memory, e.g. by a later run,
+            with one subdirectory per map fingerprint
+        disk_capacity : int, optional
+            maximum number of paths kept in the directory, the least recently used files are deleted beyond it
+        """
+        self.capacity = capacity
+        self.directory = directory
+        self.disk_capacity = disk_capacity
+        self.paths: OrderedDict[tuple[Route, Position], list[Position]] = OrderedDict()
+        # Entry of every cell on a cached path of a route, except the goal, for the queries starting on a path
+        self.on_path: dict[Route, dict[Position, tuple[Route, Position]]] = {}
+        self.hits = 0
+        self.suffix_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    @staticmethod
+    def fingerprint(norm_map: npt.NDArray[Any]) -> str:
+        """
+        return: hexadecimal digest that changes with the shape, type or any cell of the map
+        """
+        grid = np.ascontiguousarray(norm_map)
+        digest = hashlib.sha256(f"{grid.shape}{grid.dtype.str}".encode())
+        digest.update(grid.tobytes())
+        return digest.hexdigest()
+
+    def _file(self, route: Route, start: Position) -> str:
+        """
+        return: the file of the path of the route from the start in the directory
+        """
+        assert self.directory is not None
+        name = hashlib.sha256(repr((start, route[1], route[2])).encode()).hexdigest()
+        return os.path.join(self.directory, route[0], f"{name}.npy")
+
+    def _load(self, route: Route, start: Position) -> Optional[list[Position]]:
+        """
+        return: the path stored in the directory, None if there is no directory or it is not stored
+        """
+        if self.directory is None:
+            return None
+        path = self._file(route, start)
+        try:
+            cells: npt.NDArray[np.int64] = np.load(path)
+            # The modification time of the files orders them by last use for _trim
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return [(int(row), int(col)) for row, col in cells]
+
+    def _store(self, route: Route, start: Position, path: list[Position]) -> None:
+        """
+        Writes the path to the directory. The file is written next to its final path and renamed, so a process
+        reading the same path never sees a partial file.
+        """
+        if self.directory is None:
+            return
+        directory = os.path.join(self.directory, route[0])
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(suffix=".npy", dir=directory)
+        with os.fdopen(descriptor, "wb") as file:
+            np.save(file, np.array(path, dtype=np.int64).reshape(-1, 2))
+        os.replace(temporary, self._file(route, start))
+        self._trim()
+
+    def _trim(self) -> None:
+        """
+        Deletes the least recently used files of the directory beyond disk_capacity, and the directories of the
+        maps left without any.
+        """
+        assert self.directory is not None
+        files = []
+        for map_directory in os.scandir(self.directory):
+            if map_directory.is_dir():
+                # The temporary files of the paths being written start with tmp, the others are hexadecimal
+                files += [
+                    (entry.stat().st_mtime, entry.path) for entry in os.scandir(map_directory.path)
+                    if entry.name.endswith(".npy") and not entry.name.startswith("tmp")
+                ]
+        if len(files) <= self.disk_capacity:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.disk_capacity]:
+            try:
+                os.remove(path)
+                self.disk_evictions += 1
+            except FileNotFoundError:
+                # Deleted by another process sharing the directory
+                continue
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def _add(self, route: Route, start: Position, path: list[Position]) -> None:
+        """
+        Keeps the path in memory, evicting the least recently used one when the cache is full.
+        """
+        key = (route, start)
+        if key in self.paths:
+            self._remove(key, self.paths.pop(key))
+        self.paths[key] = path
+        cells = self.on_path.setdefault(route, {})
+        for cell in [start, *path[:-1]]:
+            cells[cell] = key
+        if len(self.paths) > self.capacity:
+            self._remove(*self.paths.popitem(last=False))
+            self.evictions += 1
+
+    def _remove(self, key: tuple[Route, Position], path: list[Position]) -> None:
+        """
+        Drops the cells of the removed path that still point to it.
+        """
+        cells = self.on_path[key[0]]
+        for cell in [key[1], *path[:-1]]:
+            if cells.get(cell) == key:
+                del cells[cell]
+        if not cells:
+            del self.on_path[key[0]]
+
+    def get(
+        self, fingerprint: str, start: Position, goal: Position, parameters: tuple[Hashable, ...]
+    ) -> Optional[list[Position]]:
+        """
+        Parameters
+        ----------
+        fingerprint : str
+            fingerprint of the map, as returned by PlanCache.fingerprint
+        start : Position
+            (row, column) of the start cell
+        goal : Position
+            (row, column) of the goal cell
+        parameters : tuple
+            parameters of the search that change the path, e.g. algorithm, heuristic and diagonal neighbors
+
+        Returns
+        -------
+        list[Position], optional
+            the path from the start (excluded) to the goal, None if it is not cached
+        """
+        route = (fingerprint, goal, parameters)
+        key = (route, start)
+        if key in self.paths:
+            self.hits += 1
+            self.paths.move_to_end(key)
+            return list(self.paths[key])
+
+        on_path = self.on_path.get(route, {}).get(start)
+        if on_path is not None:
+            self.hits += 1
+            self.suffix_hits += 1
+            self.paths.move_to_end(on_path)
+            cached = self.paths[on_path]
+            return cached[cached.index(start) + 1:]
+
+        path = self._load(route, start)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.disk_hits += 1
+        self._add(route, start, path)
+        return list(path)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def put(
+        self, fingerprint: str, start: Position, goal: Position, parameters: tuple[Hashable, ...], path: list[Position]
+    ) -> None:
+        """
+        Caches the path of the query, with the arguments of get. Empty paths are not cached.
+        """
+        if not path:
+            return
+        route = (fingerprint, goal, parameters)
+        self._add(route, start, list(path))
+        self._store(route, start, path)
+
+    def invalidate(self, fingerprint: str) -> None:
+        """
+        Drops the paths of the map from memory, it has changed. The files of the map are kept, the fingerprint
+        of a changed map is different so they are never read for it, and they are still valid if the map
+        changes back.
+        """
+        for key in [key for key in self.paths if key[0][0] == fingerprint]:
+            self._remove(key, self.paths.pop(key))
+
+    def clear(self) -> None:
+        """
+        Drops every path, from memory and from the directory.
+        """
+        self.paths.clear()
+        self.on_path.clear()
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,326 @@
+"""
+This file contains the Planner class, which answers any number of path queries on one map.
+"""
+import math
+from typing import Any, Callable, Optional, TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+from distance_field import DistanceFieldCache
+from grid import GridGraph
+from heuristic import HEURISTICS, STOCHASTIC
+from hpa import HierarchicalGraph
+from morphology import distance_transform
+from node import Position
+from plan_cache import PlanCache
+from pyramid import MapPyramid
+from reachability import ReachabilityIndex
+from search_stats import SearchStats
+import ara
+import bidirectional
+import jps
+import search
+import theta
+import wavefront
+
+SearchFunction: TypeAlias = Callable[[GridGraph, Position, int, Optional[SearchStats]], list[Position]]
+
+# Search function and multiplier of the edge weights of every algorithm selectable by name
+ALGORITHMS: dict[str, tuple[SearchFunction, int]] = {
+    'a_star': (search.a_star, 1),
+    'greedy_first': (search.a_star, 0),
+    'beam': (search.beam, 0),
+    'djikstra': (search.djikstra, 1),
+    'jps': (jps.jump_point_search, 1),
+    'bidirectional_a_star': (bidirectional.bidirectional_a_star, 1),
+    'bidirectional_djikstra': (bidirectional.bidirectional_djikstra, 1),
+    'theta_star': (theta.theta_star, 1),
+    'lazy_theta_star': (theta.lazy_theta_star, 1),
+    'wavefront': (wavefront.wavefront_search, 1),
+    'ara_star': (ara.ara_star, 1),
+}
+
+# Every algorithm name accepted by Planner.plan, distance_field follows the cached field of the goal, hpa
+# plans on the cached hierarchical graph of the map and pyramid refines A* paths of the coarse maps
+ALGORITHM_NAMES: list[str] = [*ALGORITHMS, 'distance_field', 'hpa', 'pyramid']
+
+# Algorithms that ignore the depth limit, the other ones can return another path, or none, under another limit
+NO_DEPTH_LIMIT: list[str] = ['distance_field', 'hpa']
+
+# Algorithms that take the weights of the moves from GridGraph.neighbors, and so can weigh them by clearance
+CLEARANCE_ALGORITHMS: list[str] = ['a_star', 'djikstra', 'ara_star']
+
+
+class Planner:
+    """
+    Holds one map and plans routes on it.
+
+    The search state lives in the GridGraph of the planner and is invalidated between queries by starting a
+    new epoch, so nothing is reallocated per query and planners on different maps are independent. The
+    distance fields of recent goals are cached until the map changes, the hierarchical graphs and the
+    reachability index are updated with the changed cells and the map pyramid is coarsened again.
+
+    plan_anytime returns the best path found within a time budget and how far from the shortest it can be.
+
+    A* and Djikstra can make the moves close to obstacles more expensive, with the clearance of the cells
+    computed once per version of the map.
+
+    Queries whose goal cannot be reached from the start are answered by the reachability index without a
+    search, and a blocked start or goal is first snapped to the nearest free cell that can be reached.
+
+    With a PlanCache, the paths found by plan are kept under the fingerprint of the map, and a route planned
+    again, or from a cell on a cached path to the same goal, is answered without a search. The paths of the
+    stochastic heuristics are not cached.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, norm_map: npt.NDArray[Any], plan_cache: Optional[PlanCache] = None):
+        """
+        Parameters
+        ----------
+        norm_map : numpy.ndarray
+            2D map where obstacles are 1 and free space is 0, e.g. GridMap.norm_map
+        plan_cache : PlanCache, optional
+            cache of the paths found by plan, which can be shared by the planners of several maps
+        """
+        self.norm_map = norm_map
+        self.graph = GridGraph(norm_map)
+        self.distance_fields = DistanceFieldCache(compute=wavefront.wavefront_field)
+        # Hierarchical graph of the map for each connectivity, built by the first hpa query
+        self.hierarchies: dict[bool, HierarchicalGraph] = {}
+        # Coarse levels of the map, built by the first pyramid query
+        self.pyramid: Optional[MapPyramid] = None
+        self.reachability = ReachabilityIndex(norm_map)
+        # Distance from every cell to the closest blocked cell, computed by the first clearance weighted query,
+        # and the multiplier of the weights of the moves into every cell for each clearance weight
+        self.clearance: Optional[npt.NDArray[np.float64]] = None
+        self.cost_scales: dict[float, npt.NDArray[np.float64]] = {}
+        self.plan_cache = plan_cache
+        self.fingerprint = '' if plan_cache is None else PlanCache.fingerprint(norm_map)
+
+    def update_map(self, norm_map: npt.NDArray[Any]) -> npt.NDArray[np.intp]:
+        """
+        Writes a new version of the map into the map of the planner and drops what was cached for the old one.
+
+        Parameters
+        ----------
+        norm_map : numpy.ndarray
+            2D map of the same shape where obstacles are 1 and free space is 0
+
+        Returns
+        -------
+        numpy.ndarray
+            cell ids of the cells that changed
+        """
+        changed = np.flatnonzero(self.graph.occupancy != np.asarray(norm_map).reshape(-1))
+        if changed.size:
+            np.copyto(self.norm_map, norm_map)
+            self.distance_fields.clear()
+            self.clearance = None
+            self.cost_scales.clear()
+            for hierarchy in self.hierarchies.values():
+                hierarchy.update_cells(changed)
+            if self.pyramid is not None:
+                self.pyramid.update()
+            self.reachability.update_cells(changed)
+            if self.plan_cache is not None:
+                self.plan_cache.invalidate(self.fingerprint)
+                self.fingerprint = PlanCache.fingerprint(self.norm_map)
+        return changed
+
+    def clear_caches(self) -> None:
+        """
+        Drops the distance fields, hierarchical graphs, map pyramid and clearance built by earlier queries, so the
+        next query builds what it needs again, e.g. to time it cold.
+        """
+        self.distance_fields.clear()
+        self.hierarchies.clear()
+        self.pyramid = None
+        self.clearance = None
+        self.cost_scales.clear()
+
+    def cost_scale(self, clearance_weight: float) -> Optional[npt.NDArray[np.float64]]:
+        """
+        return: the multiplier of the weight of the moves into every cell, None for a weight of 0
+        """
+        if not clearance_weight:
+            return None
+        if self.clearance is None:
+            self.clearance = distance_transform(self.norm_map != 0).reshape(-1)
+        if clearance_weight not in self.cost_scales:
+            # Free cells are at least one cell away from a blocked cell, the blocked cells are never entered
+            self.cost_scales[clearance_weight] = 1 + clearance_weight / np.maximum(self.clearance, 1)
+        return self.cost_scales[clearance_weight]
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    def plan(
+        self,
+        start: Position,
+        goal: Position,
+        algorithm: str = 'a_star',
+        heuristic: str = 'manhattan',
+        diagonal: bool = False,
+        depth_limit: int = 1000000,
+        stats: Optional[SearchStats] = None,
+        lazy_heuristic: bool = False,
+        beam_width: int = search.BEAM_WIDTH,
+        clearance_weight: float = 0.0,
+    ) -> list[Position]:
+        """
+        Plans a route on the map.
+
+        Parameters
+        ----------
+        start : Position
+            (row, column) of the start cell
+        goal : Position
+            (row, column) of the goal cell
+        algorithm : str, optional
+            name of the search algorithm, one of ALGORITHM_NAMES
+        heuristic : str, optional
+            name of the heuristic, one of heuristic.HEURISTICS
+        diagonal : bool, optional
+            whether diagonal neighbors are allowed
+        depth_limit : int, optional
+            the depth limit of the search
+        stats : SearchStats, optional
+            counters filled in by the search, which is not instrumented without them. The distance_field and hpa
+            algorithms do not fill them in, nor does a path served by the plan cache
+        lazy_heuristic : bool, optional
+            compute the heuristic of the visited cells only
+        beam_width : int, optional
+            number of cells kept at every level of beam search
+        clearance_weight : float, optional
+            the weight of a move into a cell at a distance c of the closest blocked cell is multiplied by
+            1 + clearance_weight / c, only with the algorithms of CLEARANCE_ALGORITHMS
+
+        Returns
+        -------
+        list[Position]
+            the path from the start (excluded) to the goal, empty if no path is found. A blocked start is
+            snapped to the nearest free cell that can reach the goal, which is then the first cell of the path,
+            and a blocked goal to the nearest free cell that the start can reach, which is then the last one
+        """
+        # Positions computed from world coordinates hold numpy integers
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        if clearance_weight and algorithm not in CLEARANCE_ALGORITHMS:
+            raise ValueError(f"{algorithm} cannot weigh the moves by clearance, use one of {CLEARANCE_ALGORITHMS}")
+        # Parameters of the query that change the path found, besides the map, start and goal
+        parameters = (
+            algorithm, heuristic, diagonal, clearance_weight, beam_width if algorithm == 'beam' else None,
+            None if algorithm in NO_DEPTH_LIMIT else depth_limit,
+        )
+        # The paths of a stochastic heuristic are drawn again by every search, and never cached
+        cache = None if HEURISTICS[heuristic] in STOCHASTIC else self.plan_cache
+        if cache is not None:
+            cached = cache.get(self.fingerprint, start, goal, parameters)
+            if cached is not None:
+                return cached
+
+        snapped = self.reachability.snap(start, goal, diagonal)
+        if snapped is None:
+            return []
+        path = self.run_search(
+            *snapped, algorithm, heuristic, diagonal, depth_limit, stats, lazy_heuristic, beam_width,
+            self.cost_scale(clearance_weight),
+        )
+        if snapped[0] != start:
+            path = [snapped[0], *path]
+        if cache is not None:
+            cache.put(self.fingerprint, start, goal, parameters, path)
+        return path
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def run_search(
+        self,
+        start: Position,
+        goal: Position,
+        algorithm: str,
+        heuristic: str,
+        diagonal: bool,
+        depth_limit: int,
+        stats: Optional[SearchStats],
+        lazy_heuristic: bool,
+        beam_width: int,
+        cost_scale: Optional[npt.NDArray[np.float64]] = None,
+    ) -> list[Position]:
+        """
+        Runs the algorithm between two free cells, with the arguments of plan.
+        """
+        if algorithm == 'distance_field':
+            return self.distance_fields.get(self.graph, goal, diagonal).path(start)
+        if algorithm == 'hpa':
+            if diagonal not in self.hierarchies:
+                self.hierarchies[diagonal] = HierarchicalGraph(self.norm_map, diagonal=diagonal)
+            return self.hierarchies[diagonal].plan(start, goal, HEURISTICS[heuristic])
+        if algorithm == 'pyramid':
+            if self.pyramid is None:
+                self.pyramid = MapPyramid(self.norm_map)
+            return self.pyramid.plan(start, goal, HEURISTICS[heuristic], diagonal, depth_limit, stats)
+
+        search_func, cost_addition = ALGORITHMS[algorithm]
+        self.graph.reset(goal, HEURISTICS[heuristic], diagonal, cost_addition, lazy_heuristic, cost_scale)
+        if algorithm == 'beam':
+            return search.beam(self.graph, start, depth_limit, stats, beam_width)
+        return search_func(self.graph, start, depth_limit, stats)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def plan_anytime(
+        self,
+        start: Position,
+        goal: Position,
+        time_budget: float = ara.ARA_TIME_BUDGET,
+        heuristic: str = 'manhattan',
+        diagonal: bool = False,
+        weight: float = ara.ARA_WEIGHT,
+        stats: Optional[SearchStats] = None,
+        callback: Optional[Callable[[list[Position], float], None]] = None,
+    ) -> tuple[list[Position], float]:
+        """
+        Plans a route with ARA*, which finds a first path with the heuristic multiplied by weight and improves it
+        until the time budget runs out or the path is proven to be the shortest.
+
+        Parameters
+        ----------
+        start : Position
+            (row, column) of the start cell
+        goal : Position
+            (row, column) of the goal cell
+        time_budget : float, optional
+            seconds the search can take, the search is stopped when they run out
+        heuristic : str, optional
+            name of the heuristic, one of heuristic.HEURISTICS, it has to be admissible for the bound to hold
+        diagonal : bool, optional
+            whether diagonal neighbors are allowed
+        weight : float, optional
+            weight of the heuristic of the first search, higher weights find the first path faster
+        stats : SearchStats, optional
+            counters filled in by all the searches
+        callback : callable, optional
+            called with every better path and its bound as soon as it is found, so the robot can start on the
+            first path before the time budget runs out
+
+        Returns
+        -------
+        tuple[list[Position], float]
+            the best path, as returned by plan, and the bound of its cost over the cost of the shortest path,
+            1 when it is the shortest and infinity when no path is found
+        """
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        snapped = self.reachability.snap(start, goal, diagonal)
+        if snapped is None:
+            return [], math.inf
+
+        self.graph.reset(snapped[1], HEURISTICS[heuristic], diagonal)
+        path: list[Position] = []
+        bound = math.inf
+        for path, bound in ara.anytime_a_star(self.graph, snapped[0], time_budget, weight, stats=stats):
+            if callback is not None:
+                callback(path if snapped[0] == start else [snapped[0], *path], bound)
+        if not path and snapped[0] != snapped[1]:
+            return [], bound
+        return (path if snapped[0] == start else [snapped[0], *path]), bound
@@ -0,0 +1,182 @@
+"""
+This file contains MapPyramid, coarser copies of the map on which a long query is solved first, so the search
+on the map itself is limited to a corridor around the coarse path.
+"""
+from typing import Any, Callable, Optional, TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+from grid import GridGraph
+from morphology import dilate, square_kernel
+from node import HeuristicFunction, Position
+from search_stats import SearchStats
+import search
+
+# Search function run at every level, one of the functions of planner.ALGORITHMS
+SearchFunction: TypeAlias = Callable[[GridGraph, Position, int, Optional[SearchStats]], list[Position]]
+
+
+def coarsen(level_map: npt.NDArray[Any], factor: int) -> npt.NDArray[Any]:
+    """
+    :param level_map: 2D map where obstacles are nonzero
+    :param factor: number of rows and columns of the map under a coarse cell
+    :return: the coarse map, where a cell is blocked if any cell of the map beneath it is blocked
+    """
+    rows, cols = level_map.shape
+    padded = np.pad(level_map, ((0, -rows % factor), (0, -cols % factor)))
+    blocks = padded.reshape((padded.shape[0] // factor, factor, padded.shape[1] // factor, factor))
+    return np.asarray(blocks.max(axis=(1, 3)))
+
+
+class MapPyramid:
+    """
+    Levels of the map, level 0 is the map and every level is coarser than the one below by factor.
+
+    A query is solved on the coarsest level first. Each finer level is only searched inside a corridor of the
+    coarse path, widened until the search succeeds, so most of the map is never looked at. The coarse levels
+    block any cell over an obstacle, so a narrow passage can be closed there, and when a level has no path the
+    next finer one is searched without a corridor. Paths stay inside the corridor, so they can be a little longer
+    than the shortest path.
+
+    Every level has its own graph on a copy of the level where the cells outside of the corridor are blocked.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, norm_map: npt.NDArray[Any], factor: int = 2, min_size: int = 128, corridor: int = 2):
+        """
+        Parameters
+        ----------
+        norm_map : numpy.ndarray
+            2D map where obstacles are 1 and free space is 0, e.g. GridMap.norm_map, shared with the pyramid
+        factor : int, optional
+            number of rows and columns of a level under a cell of the next level
+        min_size : int, optional
+            the coarsest level is the first one with at most min_size rows and columns. Coarser levels close
+            more passages and their paths take longer detours
+        corridor : int, optional
+            cells of a level kept around the coarse path on the first try, multiplied by 4 on every retry
+        """
+        self.factor = factor
+        self.corridor = corridor
+        self.maps: list[npt.NDArray[Any]] = [norm_map]
+        while max(self.maps[-1].shape) > min_size:
+            self.maps.append(coarsen(self.maps[-1], factor))
+
+        self.masked = [np.empty_like(level_map) for level_map in self.maps]
+        self.graphs = [GridGraph(masked) for masked in self.masked]
+
+    def update(self) -> None:
+        """
+        Computes the coarse levels again after the map has changed.
+        """
+        for level in range(1, len(self.maps)):
+            np.copyto(self.maps[level], coarsen(self.maps[level - 1], self.factor))
+
+    def position(self, position: Position, level: int) -> Position:
+        """
+        return: the cell of the level above the position of the map
+        """
+        scale = self.factor ** level
+        return position[0] // scale, position[1] // scale
+
+    def refine(self, cells: list[Position], level: int, width: int) -> npt.NDArray[np.bool_]:
+        """
+        return: mask of the cells of the level under the cells of the level above, widened by width cells
+        """
+        mask = np.zeros(self.maps[level + 1].shape, dtype=bool)
+        rows, cols = zip(*cells)
+        mask[list(rows), list(cols)] = True
+        mask = mask.repeat(self.factor, axis=0).repeat(self.factor, axis=1)
+        mask = mask[:self.maps[level].shape[0], :self.maps[level].shape[1]]
+        return dilate(mask, square_kernel(width))
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def search_level(
+        self,
+        level: int,
+        start: Position,
+        goal: Position,
+        corridor: Optional[npt.NDArray[np.bool_]],
+        search_func: SearchFunction,
+        heuristic_function: HeuristicFunction,
+        diagonal: bool,
+        depth_limit: int,
+        stats: Optional[SearchStats],
+    ) -> Optional[list[Position]]:
+        """
+        Searches the level, inside the corridor if there is one.
+
+        return: the path at the level, None if it is not found
+        """
+        masked = self.masked[level]
+        np.copyto(masked, self.maps[level])
+        if corridor is not None:
+            masked[~corridor] = 1
+        # The coarse cells of a start or goal next to an obstacle are blocked, the path only has to leave them
+        if level > 0:
+            masked[start] = masked[goal] = 0
+
+        # The heuristic field of the whole level is not worth it for a corridor
+        graph = self.graphs[level]
+        graph.reset(goal, heuristic_function, diagonal, lazy_heuristic=True)
+        path = search_func(graph, start, depth_limit, stats)
+        return path if path or start == goal else None
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def plan(
+        self,
+        start: Position,
+        goal: Position,
+        heuristic_function: HeuristicFunction,
+        diagonal: bool = False,
+        depth_limit: int = 1000000,
+        stats: Optional[SearchStats] = None,
+        search_func: SearchFunction = search.a_star,
+    ) -> list[Position]:
+        """
+        Plans from the coarsest level down to the map.
+
+        Parameters
+        ----------
+        start : Position
+            (row, column) of the start cell
+        goal : Position
+            (row, column) of the goal cell
+        heuristic_function : HeuristicFunction
+            heuristic of the searches
+        diagonal : bool, optional
+            whether diagonal neighbors are allowed
+        depth_limit : int, optional
+            the depth limit of every search
+        stats : SearchStats, optional
+            counters filled in by every search
+        search_func : SearchFunction, optional
+            search run at every level, A* by default
+
+        Returns
+        -------
+        list[Position]
+            the path from the start (excluded) to the goal, empty if no path is found
+        """
+        path: Optional[list[Position]] = None
+        for level in reversed(range(len(self.maps))):
+            level_start = self.position(start, level)
+            level_goal = self.position(goal, level)
+
+            # The corridor is widened until the search succeeds, the last try searches the whole level
+            cells = None if path is None else [self.position(start, level + 1), *path]
+            width = self.corridor
+            while True:
+                corridor = None if cells is None else self.refine(cells, level, width)
+                path = self.search_level(
+                    level, level_start, level_goal, corridor, search_func, heuristic_function, diagonal,
+                    depth_limit, stats,
+                )
+                if path is not None or corridor is None or corridor.all():
+                    break
+                width *= 4
+                if width >= max(self.maps[level].shape):
+                    cells = None
+        return path or []
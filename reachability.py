@@ -0,0 +1,261 @@
+"""
+This file contains ReachabilityIndex, the connected components of the free cells of a map, which answer in
+constant time whether a goal can be reached at all before any search is run.
+"""
+from typing import Any, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from grid import DIAGONAL_MOVES, STRAIGHT_MOVES
+from node import Position
+
+# Half of the moves, each edge between neighboring cells is listed once
+_EDGE_MOVES = {
+    diagonal: [move for move in (STRAIGHT_MOVES + DIAGONAL_MOVES if diagonal else STRAIGHT_MOVES) if move > (0, 0)]
+    for diagonal in (False, True)
+}
+
+
+def _edges(free: npt.NDArray[np.bool_], diagonal: bool) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+    """
+    return: the cell ids of both ends of every edge between two free neighboring cells
+    """
+    rows, cols = free.shape
+    indices = np.arange(free.size).reshape(rows, cols)
+    first: list[npt.NDArray[np.intp]] = []
+    second: list[npt.NDArray[np.intp]] = []
+    for d_row, d_col in _EDGE_MOVES[diagonal]:
+        sources = np.s_[0:rows - d_row, max(-d_col, 0):cols - max(d_col, 0)]
+        targets = np.s_[d_row:rows, max(d_col, 0):cols + min(d_col, 0)]
+        both = free[sources] & free[targets]
+        first.append(indices[sources][both])
+        second.append(indices[targets][both])
+    return np.concatenate(first), np.concatenate(second)
+
+
+def label_components(free: npt.NDArray[np.bool_], diagonal: bool = False) -> npt.NDArray[np.intp]:
+    """
+    Labels the connected components of the free cells with a vectorized union-find: every round, the root of
+    each edge with two different roots is hooked under the smaller one, then every cell jumps to its root.
+    Components that touch another one at least halve every round, so there are O(log n) rounds.
+
+    :param free: 2D mask of the free cells
+    :param diagonal: whether diagonal neighbors are connected
+    :return: flat array of the label of every cell, the smallest cell id of its component, -1 for blocked cells
+    """
+    first, second = _edges(free, diagonal)
+    root = np.arange(free.size)
+    while first.size:
+        first_root, second_root = root[first], root[second]
+        apart = first_root != second_root
+        first, second = first[apart], second[apart]
+        if not first.size:
+            break
+        np.minimum.at(
+            root,
+            np.maximum(first_root[apart], second_root[apart]),
+            np.minimum(first_root[apart], second_root[apart]),
+        )
+        while True:
+            jumped = root[root]
+            if np.array_equal(jumped, root):
+                break
+            root = jumped
+    return np.where(free.reshape(-1), root, -1)
+
+
+class ReachabilityIndex:
+    """
+    Connected components of the free cells of a map, for 4 and 8 connectivity, computed once per map and
+    connectivity and updated with the cells that change.
+
+    Two cells are connected if a path exists between them, so a query whose start and goal have different
+    labels has no path. Blocked starts and goals are snapped to the nearest free cell that can be reached.
+    """
+
+    def __init__(self, norm_map: npt.NDArray[Any]):
+        """
+        Parameters
+        ----------
+        norm_map : numpy.ndarray
+            2D map where obstacles are 1 and free space is 0, e.g. GridMap.norm_map, shared with the index
+        """
+        self.norm_map = norm_map
+        self.rows, self.cols = norm_map.shape
+        # Labels of the cells for each connectivity, computed by the first query with it
+        self.components: dict[bool, npt.NDArray[np.intp]] = {}
+
+    def labels(self, diagonal: bool = False) -> npt.NDArray[np.intp]:
+        """
+        return: flat array of the component of every cell, -1 for blocked cells
+        """
+        if diagonal not in self.components:
+            self.components[diagonal] = label_components(self.norm_map == 0, diagonal)
+        return self.components[diagonal]
+
+    def label(self, position: Position, diagonal: bool = False) -> int:
+        """
+        return: the component of the cell, -1 if it is blocked
+        """
+        return int(self.labels(diagonal)[position[0] * self.cols + position[1]])
+
+    def connected(self, start: Position, goal: Position, diagonal: bool = False) -> bool:
+        """
+        return: whether a path exists between the two cells
+        """
+        label = self.label(start, diagonal)
+        return label >= 0 and label == self.label(goal, diagonal)
+
+    def _neighbors(self, cell: int, diagonal: bool) -> list[int]:
+        """
+        return: the cell ids of the neighbors of the cell inside the map
+        """
+        row, col = divmod(cell, self.cols)
+        return [
+            (row + d_row) * self.cols + col + d_col
+            for d_row, d_col in (STRAIGHT_MOVES + DIAGONAL_MOVES if diagonal else STRAIGHT_MOVES)
+            if 0 <= row + d_row < self.rows and 0 <= col + d_col < self.cols
+        ]
+
+    def _bypassed(self, cell: int, diagonal: bool, free: npt.NDArray[np.bool_]) -> bool:
+        """
+        return: whether the free neighbors of the blocked cell are connected through the 8 cells around it, so
+        every path through the cell has a detour and its component does not split
+        """
+        ring = set(self._neighbors(cell, True))
+        neighbors = [neighbor for neighbor in self._neighbors(cell, diagonal) if free[neighbor]]
+        if not neighbors:
+            return True
+        reached = {neighbors[0]}
+        frontier = [neighbors[0]]
+        while frontier:
+            for neighbor in self._neighbors(frontier.pop(), diagonal):
+                if neighbor in ring and free[neighbor] and neighbor not in reached:
+                    reached.add(neighbor)
+                    frontier.append(neighbor)
+        return reached.issuperset(neighbors)
+
+    def _merge(self, labels: npt.NDArray[np.intp], freed: list[int], diagonal: bool) -> None:
+        """
+        Labels the freed cells and merges the components they join, with a union-find over the labels.
+        """
+        freed = [cell for cell in freed if labels[cell] < 0]
+        root: dict[int, int] = {}
+
+        def find(label: int) -> int:
+            while root.setdefault(label, label) != label:
+                label = root[label]
+            return label
+
+        labels[freed] = freed
+        for cell in freed:
+            for neighbor in self._neighbors(cell, diagonal):
+                if labels[neighbor] >= 0:
+                    first, second = find(cell), find(int(labels[neighbor]))
+                    # The smallest cell id of the merged component stays its label
+                    root[max(first, second)] = min(first, second)
+
+        renamed = np.array([label for label in root if find(label) != label], dtype=np.intp)
+        if renamed.size:
+            moved = np.flatnonzero(np.isin(labels, renamed))
+            labels[moved] = [find(label) for label in labels[moved].tolist()]
+
+    # pylint: disable=too-many-locals
+    def _relabel(
+        self, labels: npt.NDArray[np.intp], cells: npt.NDArray[np.intp], diagonal: bool, free: npt.NDArray[np.bool_]
+    ) -> None:
+        """
+        Labels again the components that contain or touch the changed cells.
+        """
+        # Components that lost a cell can split, components next to a freed cell can merge
+        rows, cols = np.divmod(cells, self.cols)
+        touched = [labels[cells]]
+        for d_row, d_col in STRAIGHT_MOVES + DIAGONAL_MOVES if diagonal else STRAIGHT_MOVES:
+            n_rows, n_cols = rows + d_row, cols + d_col
+            inside = (n_rows >= 0) & (n_rows < self.rows) & (n_cols >= 0) & (n_cols < self.cols)
+            touched.append(labels[n_rows[inside] * self.cols + n_cols[inside]])
+        affected = np.unique(np.concatenate(touched))
+        region = np.isin(labels, affected[affected >= 0]) & free
+        region[cells] = free[cells]
+
+        # The new labels are the smallest cell ids of the new components, so they stay unique
+        relabeled = label_components(region.reshape(self.rows, self.cols), diagonal)
+        labels[region] = relabeled[region]
+        labels[~free] = -1
+
+    def update_cells(self, cells: npt.NDArray[np.intp]) -> None:
+        """
+        Updates the labels after the map has changed. Freed cells only merge components. A blocked cell whose
+        neighbors stay connected around it is dropped, any other blocked cell can split its component, and the
+        components that contain or touch the changed cells are labeled again. The other components keep their
+        labels.
+
+        :param cells: cell ids of the cells that changed
+        """
+        if not cells.size:
+            return
+        free = (self.norm_map == 0).reshape(-1)
+        changed = set(cells.tolist())
+        freed = sorted(cell for cell in changed if free[cell])
+        blocked = [cell for cell in changed if not free[cell]]
+        # Blocked cells next to other changed cells could need each other's detours
+        isolated = all(changed.isdisjoint(self._neighbors(cell, True)) for cell in blocked)
+
+        for diagonal, labels in self.components.items():
+            # A label is the smallest cell id of its component, so it cannot be a blocked cell
+            if isolated and all(labels[cell] != cell and self._bypassed(cell, diagonal, free) for cell in blocked):
+                labels[blocked] = -1
+                self._merge(labels, freed, diagonal)
+            else:
+                self._relabel(labels, cells, diagonal, free)
+
+    # pylint: disable=too-many-locals
+    def nearest(self, position: Position, diagonal: bool = False, label: Optional[int] = None) -> Optional[Position]:
+        """
+        Finds the closest free cell by straight line distance, in windows of growing size around the position.
+
+        :param position: the (row, column) to snap
+        :param diagonal: whether diagonal neighbors are connected
+        :param label: the component the cell has to be in, any free cell without it
+        :return: the closest cell, None if there is none
+        """
+        labels = self.labels(diagonal).reshape(self.rows, self.cols)
+        radius = 8
+        while True:
+            row_begin, row_end = max(position[0] - radius, 0), min(position[0] + radius + 1, self.rows)
+            col_begin, col_end = max(position[1] - radius, 0), min(position[1] + radius + 1, self.cols)
+            window = labels[row_begin:row_end, col_begin:col_end]
+            rows, cols = np.nonzero(window >= 0 if label is None else window == label)
+            covers_map = row_end - row_begin == self.rows and col_end - col_begin == self.cols
+            if rows.size:
+                squared = (rows + row_begin - position[0]) ** 2 + (cols + col_begin - position[1]) ** 2
+                best = int(np.argmin(squared))
+                # A closer cell outside of the window would be more than radius away
+                if squared[best] <= radius ** 2 or covers_map:
+                    return int(rows[best]) + row_begin, int(cols[best]) + col_begin
+            if covers_map:
+                return None
+            radius *= 2
+
+    def snap(self, start: Position, goal: Position, diagonal: bool = False) -> Optional[tuple[Position, Position]]:
+        """
+        Moves a blocked start or goal to the nearest free cell from which the other one can be reached.
+
+        :param start: (row, column) of the start cell
+        :param goal: (row, column) of the goal cell
+        :param diagonal: whether diagonal neighbors are connected
+        :return: the start and the goal, None if the goal cannot be reached from the start
+        """
+        if self.label(start, diagonal) < 0:
+            goal_label = self.label(goal, diagonal)
+            snapped = self.nearest(start, diagonal, goal_label if goal_label >= 0 else None)
+            if snapped is None:
+                return None
+            start = snapped
+        if self.label(goal, diagonal) < 0:
+            snapped = self.nearest(goal, diagonal, self.label(start, diagonal))
+            if snapped is None:
+                return None
+            goal = snapped
+        return (start, goal) if self.connected(start, goal, diagonal) else None
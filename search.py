@@ -1,152 +1,166 @@
 """
 This file contains the search algorithms that are used to find the path from the start node to the end node
 """
-from queue import PriorityQueue
 from typing import Optional
-import heapq
 
-from node import Node, Position
+import numpy as np
+import numpy.typing as npt
+
+from grid import GridGraph
+from node import Position
+from search_stats import SearchStats
 import utils as util
 
 
-# pylint: disable=too-many-locals
-def djikstra(start: Position, depth_limit: int = 10000) -> list[Position]:
+def djikstra(
+    graph: GridGraph, start: Position, depth_limit: int = 10000, stats: Optional[SearchStats] = None
+) -> list[Position]:
     '''
+    :param graph: Grid to search, prepared for the goal with GridGraph.reset
     :param start: Start position to run djikstra with
-    :param iterations: Number of iterations to allow djikstra to run
+    :param depth_limit: Number of iterations to allow djikstra to run
+    :param stats: Counters to fill in, the search is not instrumented without them
     Returns a list of Positions of the path if possible
     '''
-    graph = Node.worldmap_reference
-    rows, cols = len(graph), len(graph[0])
-
-    # Initialize distances and predecessors
-    distances = {(i, j): float("infinity") for i in range(rows) for j in range(cols)}
-    distances[start] = 0
-    predecessors: dict[Position, Optional[Node]] = {
-        (i, j): None for i in range(rows) for j in range(cols)
-    }
-
-    priority_queue = [(0, Node.worldmap_reference[start[0], start[1]])]
+    open_list, i = util.initialize_algorithm(graph, start, use_heuristic=False)
+    path: Optional[list[Position]] = None
 
-    i = 0
-    while priority_queue and i < depth_limit:
+    while open_list and i < depth_limit:
         i += 1
-        current_distance, current_node = heapq.heappop(priority_queue)
-
-        if current_distance > distances[current_node]:
-            continue
-
-        neighbors = current_node.get_neighbors()
-
-        for neighbor in neighbors:
-            ni, nj = neighbor.pos[0], neighbor.pos[1]
-
-            if 0 <= ni < rows and 0 <= nj < cols:
-                distance = current_distance + 1
-
-                if distance < distances[(ni, nj)]:
-                    distances[(ni, nj)] = distance
-                    predecessors[(ni, nj)] = current_node
-                    heapq.heappush(priority_queue, (distance, neighbor))
-
-    def get_shortest_path(
-        predecessors: dict[Position, Optional[Node]],
-        start: Position,
-        destination: Position,
-    ) -> list[Position]:
-        path: list[Position] = []
-        current_node = destination
+        current_index = open_list.pop()
+        graph.mark_visited(current_index)
 
-        if predecessors[current_node] is None:
-            return []
+        if current_index == graph.goal_index:
+            path = util.backtrack(graph, current_index, start)
+            break
 
-        while current_node is not None:
-            if isinstance(current_node, Node):
-                path.insert(0, (current_node.pos[0], current_node.pos[1]))
-            else:
-                path.insert(0, current_node)
+        if stats is None:
+            neighbors = graph.neighbors(current_index)
+        else:
+            neighbors = stats.expand(current_index, graph.neighbors, len(open_list))
+        for neighbor, weight in neighbors:
+            distance = graph.g[current_index] + weight
 
-            current_node = predecessors[current_node]  # type: ignore
+            if distance < graph.cost(neighbor):
+                graph.set_cost(neighbor, distance, current_index)
+                open_list.push(neighbor, distance)
 
-        if path[0] != start:
-            return []
+    if stats is not None:
+        stats.record(open_list, i, depth_limit, path is not None)
+    return path or []
 
-        return path
 
-    return get_shortest_path(predecessors, start, Node.end_coordinate)
-
-
-def a_star(start: Position, depth_limit: int = 50) -> list[Position]:
+def a_star(
+    graph: GridGraph, start: Position, depth_limit: int = 50, stats: Optional[SearchStats] = None
+) -> list[Position]:
     """
-    :param heuristic: the heuristic function to use for calculating the distance between two nodes
-    :param diagonal_neighbors: whether diagonal neighbors are allowed
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
     :param depth_limit: the depth limit of the search
+    :param stats: the counters to fill in, the search is not instrumented without them
     Returns: a list of nodes that represents the path from the start node to the end node
     """
-    # Initialize the priority queue, the explored set, and the depth
-    queue, depth = util.initialize_algorithm(start)
+    # Initialize the open list and the depth
+    open_list, depth = util.initialize_algorithm(graph, start)
+    path: Optional[list[Position]] = None
 
-    # While the queue is not empty and the depth limit is not reached
-    while not queue.empty() and depth < depth_limit:
+    # While the open list is not empty and the depth limit is not reached
+    while open_list and depth < depth_limit:
         # Update the depth
         depth += 1
 
         # Get the current node and add it to the explored set
-        current_node = queue.get()
+        current_index = open_list.pop()
+        graph.mark_visited(current_index)
 
         # If the current node is the goal node
-        if current_node == Node.end_coordinate:
-            return util.backtrack(current_node, start)
+        if current_index == graph.goal_index:
+            path = util.backtrack(graph, current_index, start)
+            break
+
+        # Open the neighbors reached with a lower cost, re-opening explored ones if needed
+        if stats is None:
+            neighbors = graph.neighbors(current_index)
+        else:
+            neighbors = stats.expand(current_index, graph.neighbors, len(open_list))
+        for neighbor, weight in neighbors:
+            cost = graph.g[current_index] + graph.cost_addition * weight
+            util.open_neighbor(graph, open_list, neighbor, cost, current_index, stats)
+
+    # The path is empty if it is not found
+    if stats is not None:
+        stats.record(open_list, depth, depth_limit, path is not None)
+    return path or []
 
-        # Add the neighbors that can be explored to the queue
-        for neighbor in current_node.get_neighbors():
-            queue.put(neighbor)
 
-    # Return an empty list if the path is not found
-    print(depth)
-    return []
+# Number of cells kept at every level of beam search by default
+BEAM_WIDTH = 50
 
+# Below this many candidates, _lowest sorts them in Python, which is cheaper than the NumPy calls
+_SORT_BELOW = 16
 
-beam_frontier_size: int = 50
 
+def _lowest(priorities: npt.NDArray[np.float64], width: int) -> npt.NDArray[np.intp]:
+    """
+    Partial selection of the width lowest priorities, without sorting all of them.
 
-def beam(start: Position, depth_limit: int = 50) -> list[Position]:
+    return: the positions of the selected priorities, in the order an OpenList would pop them: by priority,
+        then by position
+    """
+    if priorities.size < _SORT_BELOW:
+        keys = priorities.tolist()
+        return np.array(sorted(range(len(keys)), key=keys.__getitem__)[:width], dtype=np.intp)
+    if priorities.size > width:
+        threshold = np.partition(priorities, width - 1)[width - 1]
+        below = np.flatnonzero(priorities < threshold)
+        tied = np.flatnonzero(priorities == threshold)[:width - below.size]
+        selected = np.sort(np.concatenate((below, tied)))
+    else:
+        selected = np.arange(priorities.size)
+    return selected[np.argsort(priorities[selected], kind='stable')]
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def beam(
+    graph: GridGraph,
+    start: Position,
+    depth_limit: int = 50,
+    stats: Optional[SearchStats] = None,
+    width: int = BEAM_WIDTH,
+) -> list[Position]:
     """
-    :param heuristic: the heuristic function to use for calculating the distance between two nodes
-    :param k: the number of nodes to keep in the frontier
-    :param diagonal_neighbors: whether diagonal neighbors are allowed
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
     :param depth_limit: the depth limit of the search
+    :param stats: the counters to fill in, the search is not instrumented without them
+    :param width: the number of cells kept at every level
     Returns: a list of nodes that represents the path from the start node to the end node
     """
-    # Initialize the frontier set and the depth
-    queue, depth = util.initialize_algorithm(start)
+    # Initialize the frontier and the depth
+    queue, depth = util.initialize_algorithm(graph, start)
+    path: Optional[list[Position]] = None
 
-    frontier: list[Node] = [queue.get()]
+    frontier = np.array([queue.pop()], dtype=np.intp)
 
-    # While the frontier is not empty
-    while frontier and depth < depth_limit:
+    # While the frontier is not empty and the goal has not been discovered
+    while frontier.size and depth < depth_limit and not graph.is_visited(graph.goal_index):
         # Update the depth
         depth += 1
-        queue = PriorityQueue()
-
-        # Add the neighbors to the frontier
-        for node in frontier:
-            # If the current node is the goal node
-            if node == Node.end_coordinate:
-                print("Found Goal.")
-                return util.backtrack(node, start)
-
-        for node in frontier:
-            for neighbor in node.get_neighbors():
-                queue.put(neighbor)
 
-        new_frontier = []
+        # Discover the neighbors of the whole frontier at once
+        if stats is None:
+            candidates = graph.discover_many(frontier)
+        else:
+            candidates = stats.expand_many(frontier, graph.discover_many, frontier.size)
+            stats.pushes += candidates.size
 
-        for _ in range(min(beam_frontier_size, len(queue.queue))):
-            new_frontier.append(queue.get())
+        # Keep the best of them as the next frontier
+        frontier = candidates[_lowest(graph.f[candidates], width)]
 
-        frontier = new_frontier.copy()
+    if graph.is_visited(graph.goal_index):
+        path = util.backtrack(graph, graph.goal_index, start)
 
-    # Return an empty list if the path is not found
-    print(depth)
-    return []
+    # The path is empty if it is not found
+    if stats is not None:
+        stats.record(queue, depth, depth_limit, path is not None)
+    return path or []
@@ -0,0 +1,88 @@
+"""
+This file contains the SearchStats class, the opt-in instrumentation that the search functions fill in when one
+is passed to them.
+"""
+from dataclasses import dataclass
+import time
+from typing import Callable, Optional, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+from openlist import OpenList
+
+_Neighbors = TypeVar('_Neighbors')
+
+
+@dataclass
+class SearchStats:
+    """
+    Counters of one search.
+
+    The searches only touch the stats when they are given one, so a search without stats pays a single check per
+    expansion. on_expand is called with the cell id of every expanded cell, e.g. to draw the explored region.
+    """
+    # pylint: disable=too-many-instance-attributes
+    on_expand: Optional[Callable[[int], None]] = None
+    expansions: int = 0
+    pushes: int = 0
+    stale_pops: int = 0
+    max_open_size: int = 0
+    reopenings: int = 0
+    neighbor_seconds: float = 0.0
+    depth: int = 0
+    depth_limit_reached: bool = False
+
+    def expand(self, index: int, neighbors: Callable[[int], _Neighbors], open_size: int) -> _Neighbors:
+        """
+        Counts the expansion of the cell, reports it to on_expand and times the generation of its neighbors.
+
+        :param index: cell id of the expanded cell
+        :param neighbors: function generating the neighbors of a cell, e.g. GridGraph.neighbors
+        :param open_size: size of the open list, sampled at every expansion rather than tracked by every push
+        :return: the neighbors of the cell
+        """
+        self.expansions += 1
+        self.max_open_size = max(self.max_open_size, open_size)
+        if self.on_expand is not None:
+            self.on_expand(index)
+        begin = time.perf_counter()
+        result = neighbors(index)
+        self.neighbor_seconds += time.perf_counter() - begin
+        return result
+
+    def expand_many(
+        self, indices: npt.NDArray[np.intp], neighbors: Callable[[npt.NDArray[np.intp]], _Neighbors], open_size: int
+    ) -> _Neighbors:
+        """
+        expand for a batch of cells whose neighbors are generated together, e.g. by GridGraph.discover_many.
+
+        :param indices: cell ids of the expanded cells
+        :param neighbors: function generating the neighbors of the batch
+        :param open_size: size of the open list, e.g. the frontier the batch is taken from
+        :return: the neighbors of the batch
+        """
+        self.expansions += len(indices)
+        self.max_open_size = max(self.max_open_size, open_size)
+        if self.on_expand is not None:
+            for index in indices.tolist():
+                self.on_expand(index)
+        begin = time.perf_counter()
+        result = neighbors(indices)
+        self.neighbor_seconds += time.perf_counter() - begin
+        return result
+
+    def record(self, open_list: OpenList, depth: int, depth_limit: int, found: bool) -> None:
+        """
+        Adds the counters of an open list of the search and records where the search stopped.
+
+        :param open_list: an open list of the search
+        :param depth: the depth the search stopped at
+        :param depth_limit: the depth limit of the search
+        :param found: whether the search reached the goal
+        """
+        self.pushes += open_list.pushes
+        self.stale_pops += open_list.stale_pops
+        self.max_open_size = max(self.max_open_size, len(open_list))
+        self.depth = max(self.depth, depth)
+        self.depth_limit_reached = not found and depth >= depth_limit
@@ -0,0 +1,163 @@
+"""
+This file contains Theta* and Lazy Theta*, any-angle versions of A* that give a cell the parent of its parent
+whenever the straight line between them is free, so the path is a short list of waypoints instead of a
+staircase of cells.
+
+Segments cost their Euclidean length, multiplied by cost_addition, and the line of sight of a segment is the
+set of cells a Bresenham line between the two cell centers goes through. Every step of such a line is a move
+between neighboring cells, which may cut the corners of obstacles like the diagonal moves of GridGraph do.
+Without diagonal neighbors, each diagonal step also needs one of the two cells beside it to be free. The path
+is only as short as the heuristic allows: the Euclidean heuristic never overestimates the length of a segment,
+the others can.
+"""
+# pylint: disable=duplicate-code
+import math
+from typing import Any, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from grid import GridGraph
+from node import Position
+from search_stats import SearchStats
+import utils as util
+
+
+# pylint: disable=too-many-locals
+def line_of_sight(graph: GridGraph, origin: int, targets: npt.NDArray[Any]) -> npt.NDArray[np.bool_]:
+    """
+    Checks the lines from one cell to many cells at once.
+
+    :param graph: the grid
+    :param origin: cell id the lines start from
+    :param targets: cell ids the lines end at
+    :return: whether the line to each target only goes through traversable cells
+    """
+    origin_row, origin_col = divmod(origin, graph.cols)
+    target_rows, target_cols = np.divmod(targets, graph.cols)
+    d_rows = target_rows - origin_row
+    d_cols = target_cols - origin_col
+    steps = np.maximum(np.abs(d_rows), np.abs(d_cols))
+
+    # One sample per step along the major axis, the samples past the end of a shorter line repeat its end
+    fractions = np.minimum(np.arange(int(steps.max(initial=0)) + 1) / np.maximum(steps, 1)[:, None], 1.0)
+    rows = origin_row + np.floor(fractions * d_rows[:, None] + 0.5).astype(np.intp)
+    cols = origin_col + np.floor(fractions * d_cols[:, None] + 0.5).astype(np.intp)
+    occupancy = graph.occupancy.reshape(graph.rows, graph.cols)
+    blocked = occupancy[rows, cols].astype(bool).any(axis=1)
+
+    if not graph.diagonal_neighbors:
+        corners = (rows[:, :-1] != rows[:, 1:]) & (cols[:, :-1] != cols[:, 1:])
+        closed = occupancy[rows[:, :-1], cols[:, 1:]].astype(bool) & occupancy[rows[:, 1:], cols[:, :-1]].astype(bool)
+        blocked |= (corners & closed).any(axis=1)
+    return np.asarray(~blocked)
+
+
+def _distance(graph: GridGraph, first: int, second: int) -> float:
+    """
+    return: the Euclidean distance between the centers of the cells
+    """
+    first_row, first_col = divmod(first, graph.cols)
+    second_row, second_col = divmod(second, graph.cols)
+    return math.hypot(first_row - second_row, first_col - second_col)
+
+
+# pylint: disable=too-many-locals
+def theta_star(
+    graph: GridGraph, start: Position, depth_limit: int = 50, stats: Optional[SearchStats] = None
+) -> list[Position]:
+    """
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
+    :param depth_limit: the depth limit of the search
+    :param stats: the counters to fill in, the search is not instrumented without them
+    Returns: the waypoints of the path from the start node to the end node, only where the path turns
+    """
+    open_list, depth = util.initialize_algorithm(graph, start)
+    path: Optional[list[Position]] = None
+
+    while open_list and depth < depth_limit:
+        depth += 1
+        current_index = open_list.pop()
+        graph.mark_visited(current_index)
+
+        if current_index == graph.goal_index:
+            path = util.backtrack(graph, current_index, start)
+            break
+
+        if stats is None:
+            neighbors = graph.neighbors(current_index)
+        else:
+            neighbors = stats.expand(current_index, graph.neighbors, len(open_list))
+        candidates = [neighbor for neighbor, _ in neighbors if not graph.is_visited(neighbor)]
+        if not candidates:
+            continue
+
+        # The lines from the parent to every neighbor are checked in one batch
+        parent = int(graph.parent[current_index])
+        if parent >= 0:
+            visible = line_of_sight(graph, parent, np.array(candidates)).tolist()
+        else:
+            visible = [False] * len(candidates)
+
+        for neighbor, shortcut in zip(candidates, visible):
+            origin = parent if shortcut else current_index
+            cost = graph.g[origin] + graph.cost_addition * _distance(graph, origin, neighbor)
+            util.open_neighbor(graph, open_list, neighbor, cost, origin, stats)
+
+    # The path is empty if it is not found
+    if stats is not None:
+        stats.record(open_list, depth, depth_limit, path is not None)
+    return path or []
+
+
+def lazy_theta_star(
+    graph: GridGraph, start: Position, depth_limit: int = 50, stats: Optional[SearchStats] = None
+) -> list[Position]:
+    """
+    Lazy Theta* assumes that every neighbor sees the parent of the expanded cell, and only checks the line of
+    sight of a cell when it is expanded. A cell that does not see its parent takes the best of its explored
+    neighbors as parent instead, so there is one line of sight check per expansion instead of one per neighbor.
+
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
+    :param depth_limit: the depth limit of the search
+    :param stats: the counters to fill in, the search is not instrumented without them
+    Returns: the waypoints of the path from the start node to the end node, only where the path turns
+    """
+    open_list, depth = util.initialize_algorithm(graph, start)
+    path: Optional[list[Position]] = None
+
+    while open_list and depth < depth_limit:
+        depth += 1
+        current_index = open_list.pop()
+
+        if stats is None:
+            neighbors = graph.neighbors(current_index)
+        else:
+            neighbors = stats.expand(current_index, graph.neighbors, len(open_list))
+
+        parent = int(graph.parent[current_index])
+        if parent >= 0 and not line_of_sight(graph, parent, np.array([current_index]))[0]:
+            cost, parent = min(
+                (graph.g[neighbor] + graph.cost_addition * _distance(graph, neighbor, current_index), neighbor)
+                for neighbor, _ in neighbors
+                if graph.is_visited(neighbor)
+            )
+            graph.set_cost(current_index, cost, parent)
+        graph.mark_visited(current_index)
+
+        if current_index == graph.goal_index:
+            path = util.backtrack(graph, current_index, start)
+            break
+
+        origin = parent if parent >= 0 else current_index
+        for neighbor, _ in neighbors:
+            if not graph.is_visited(neighbor):
+                cost = graph.g[origin] + graph.cost_addition * _distance(graph, origin, neighbor)
+                util.open_neighbor(graph, open_list, neighbor, cost, origin, stats)
+
+    # The path is empty if it is not found
+    if stats is not None:
+        stats.record(open_list, depth, depth_limit, path is not None)
+    return path or []
@@ -7,13 +7,19 @@ Created on Sat Jul  1 20:31:06 2023
 Modified to conform to Linter and Typing standards
 """
 
-from queue import PriorityQueue
-from typing import Any
+from dataclasses import dataclass
+import time
+from typing import Any, Optional
 
 import numpy as np
 import numpy.typing as npt
 
-from node import HeuristicFunction, Node, Position
+from grid import GridGraph
+from map_cache import MapCache
+from morphology import NEIGHBOR_KERNEL, distance_transform, inflate
+from node import Position
+from openlist import OpenList
+from search_stats import SearchStats
 
 # The simulator type is a runtime defined class, thus not really capable of type hinting it
 Simulator = type[Any]
@@ -61,14 +67,24 @@ class GridMap:
         self.gridmap = np.array(bytearray(self.image), dtype="uint8").reshape(
             self.resolution[0], self.resolution[1]
         )
+        # Copy of the captured image that inflation of a region starts from
+        self.raw_gridmap = np.copy(self.gridmap)
 
         self.world_size = world_size
         self.scaling = world_size / self.resolution[0]
         self.offset = np.array([self.resolution[0] / 2, self.resolution[1] / 2, 0])
         self.norm_map: npt.NDArray[Any] = np.array([])
+        # Distance from every cell of the captured image to the closest obstacle, see compute_clearance
+        self.clearance: Optional[npt.NDArray[np.float64]] = None
 
+    # pylint: disable=too-many-locals
     def inflate_obstacles(
-        self, num_iter: int = 1, obs_thresh: int = 100, infl_val: int = 99
+        self,
+        num_iter: int = 1,
+        obs_thresh: int = 100,
+        infl_val: int = 99,
+        kernel: Optional[npt.NDArray[Any]] = None,
+        region: Optional[tuple[int, int, int, int]] = None,
     ) -> npt.NDArray[Any]:
         """
         Parameters
@@ -76,44 +92,158 @@ class GridMap:
         num_iter : int, optional
         obs_thresh : int, optional
         infl_val : int, optional
+        kernel : numpy.ndarray, optional
+            Structuring element of one pass, see morphology.square_kernel and morphology.disk_kernel.
+            The default is the 8 neighbors of a cell.
+        region : tuple, optional
+            (row_start, row_stop, col_start, col_stop) window to recompute in place from raw_gridmap,
+            e.g. after writing a local change of the scene into raw_gridmap. The whole grid is inflated
+            when it is not given.
 
         Returns
         ----------
         numpy.ndarray
         """
+        if kernel is None:
+            kernel = NEIGHBOR_KERNEL
+
+        if region is None:
+            self.gridmap = inflate(self.gridmap, num_iter, obs_thresh, infl_val, kernel)
+            return self.gridmap
+
+        # Only the raw cells within reach of the inflation can change the cells of the region
+        row_start, row_stop, col_start, col_stop = region
+        reach_rows = num_iter * (kernel.shape[0] // 2)
+        reach_cols = num_iter * (kernel.shape[1] // 2)
+        window_row = max(0, row_start - reach_rows)
+        window_col = max(0, col_start - reach_cols)
+        window = self.raw_gridmap[
+            window_row:row_stop + reach_rows, window_col:col_stop + reach_cols
+        ]
 
-        rows = self.gridmap.shape[0]
-        cols = self.gridmap.shape[1]
-        inflated_grid = np.copy(self.gridmap)
-
-        # Define the possible movements (up, down, left, right, and diagonals)
-        movements = [
-            (0, -1),  # Up
-            (0, 1),  # Down
-            (-1, 0),  # Left
-            (1, 0),  # Right
-            (-1, -1),  # Diagonal: Up-Left
-            (-1, 1),  # Diagonal: Up-Right
-            (1, -1),  # Diagonal: Down-Left
-            (1, 1),  # Diagonal: Down-Right
+        inflated = inflate(window, num_iter, obs_thresh, infl_val, kernel)
+        self.gridmap[row_start:row_stop, col_start:col_stop] = inflated[
+            row_start - window_row:row_stop - window_row,
+            col_start - window_col:col_stop - window_col,
         ]
+        return self.gridmap
 
-        # pylint: disable=too-many-nested-blocks
-        # Iterate through the grid
-        for _ in range(num_iter):
-            inflated_temp = np.copy(inflated_grid)
-            for row in range(rows):
-                for col in range(cols):
-                    if inflated_grid[row][col] < obs_thresh:  # Found an obstacle
-                        for move in movements:  # Inflate the obstacle
-                            new_row = row + move[0]
-                            new_col = col + move[1]
-                            if 0 <= new_row < rows and 0 <= new_col < cols:
-                                inflated_temp[new_row][new_col] = infl_val
-            inflated_grid = np.copy(inflated_temp)
-            self.gridmap = np.copy(inflated_grid)
+    def compute_clearance(self, obs_thresh: int = 100) -> npt.NDArray[np.float64]:
+        """
+        Computes the Euclidean distance transform of the obstacles of the captured image, once per image.
 
-        return self.gridmap
+        Parameters
+        ----------
+        obs_thresh : int, optional
+            gray level under which a cell is an obstacle
+
+        Returns
+        ----------
+        numpy.ndarray
+            distance in cells from every cell to the closest obstacle, 0 on the obstacles
+        """
+        self.clearance = distance_transform(self.raw_gridmap < obs_thresh)
+        return self.clearance
+
+    def apply_margin(self, radius: float, obs_thresh: int = 100, infl_val: int = 99) -> npt.NDArray[Any]:
+        """
+        Inflates the obstacles by a round margin with a threshold of the clearance, instead of inflation passes.
+        The clearance is computed by the first call, so changing the margin between queries costs one pass
+        over the grid, e.g. planner.update_map(worldmap.apply_margin(radius)).
+
+        Parameters
+        ----------
+        radius : float
+            cells within this distance of an obstacle are blocked, num_iter passes of inflate_obstacles block the
+            cells within num_iter moves
+        obs_thresh : int, optional
+            gray level under which a cell is an obstacle, used if the clearance is not computed yet
+        infl_val : int, optional
+            gray level given to the inflated cells
+
+        Returns
+        ----------
+        numpy.ndarray
+            the new norm_map
+        """
+        clearance = self.compute_clearance(obs_thresh) if self.clearance is None else self.clearance
+        self.gridmap = np.copy(self.raw_gridmap)
+        self.gridmap[(clearance > 0) & (clearance <= radius)] = infl_val
+        self.normalize_map()
+        return self.norm_map
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def preprocess(
+        self,
+        cache: Optional[MapCache] = None,
+        num_iter: int = 1,
+        obs_thresh: int = 100,
+        infl_val: int = 99,
+        kernel: Optional[npt.NDArray[Any]] = None,
+        radius: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Inflates the obstacles and normalizes the map, or loads both from the cache when the same image was
+        processed with the same parameters before.
+
+        Parameters
+        ----------
+        cache : MapCache, optional
+            cache of the processed maps, the map is always processed when it is not given
+        num_iter, obs_thresh, infl_val, kernel :
+            see inflate_obstacles
+        radius : float, optional
+            inflate with apply_margin instead of num_iter passes with the kernel, the clearance is cached as well
+
+        Returns
+        ----------
+        str or None
+            key of the map in the cache, e.g. for MapCache.distance_field, None without a cache
+        """
+        if cache is None:
+            self._inflate(num_iter, obs_thresh, infl_val, kernel, radius)
+            return None
+
+        if radius is None:
+            parameters: dict[str, Any] = {
+                "num_iter": num_iter,
+                "kernel": NEIGHBOR_KERNEL if kernel is None else kernel,
+            }
+        else:
+            parameters = {"radius": radius}
+        key = cache.key(self.raw_gridmap, self.world_size, obs_thresh=obs_thresh, infl_val=infl_val, **parameters)
+        gridmap = cache.load(key, "gridmap")
+        norm_map = cache.load(key, "norm_map")
+        if gridmap is not None and norm_map is not None:
+            self.gridmap, self.norm_map = gridmap, norm_map
+            if radius is not None:
+                self.clearance = cache.load(key, "clearance")
+            return key
+
+        self._inflate(num_iter, obs_thresh, infl_val, kernel, radius)
+        cache.store(key, "gridmap", self.gridmap)
+        cache.store(key, "norm_map", self.norm_map)
+        if self.clearance is not None:
+            cache.store(key, "clearance", self.clearance)
+        return key
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def _inflate(
+        self,
+        num_iter: int,
+        obs_thresh: int,
+        infl_val: int,
+        kernel: Optional[npt.NDArray[Any]],
+        radius: Optional[float],
+    ) -> None:
+        """
+        Inflates the obstacles with the parameters of preprocess and normalizes the map.
+        """
+        if radius is None:
+            self.inflate_obstacles(num_iter, obs_thresh, infl_val, kernel)
+            self.normalize_map()
+        else:
+            self.apply_margin(radius, obs_thresh, infl_val)
 
     def get_grid_coords(self, point_xyz: list[float]) -> Any:
         """
@@ -161,34 +291,16 @@ class GridMap:
         self.norm_map[self.norm_map == 1] = 0  # set free space to 0s
         self.norm_map[self.norm_map == 3] = 1  # convert obstacle back into 1s
 
-    def world_to_nodes(self, heuristic_function: HeuristicFunction) -> npt.NDArray[Any]:
+    def world_to_graph(self) -> GridGraph:
         """
-        Turns Grid into Grid of Nodes.
-
-        Parameters
-        ----------
-        heuristic_function : HeuristicFunction
-            function to apply to calculate the heuristic
+        Turns Grid into the flat array graph that the search algorithms run on.
 
         Returns
         -------
-        np.ndarray[Node]
-            2D Array of Nodes
+        GridGraph
+            Graph sharing the occupancy of norm_map
         """
-        nodes = []
-        for i in range(self.norm_map.shape[0]):
-            for j in range(self.norm_map.shape[1]):
-                pos = (i, j)
-                nodes.append(
-                    Node(
-                        pos,
-                        self.norm_map[i, j] == 1,
-                        heuristic_function(pos, Node.end_coordinate),
-                    )
-                )
-
-        return np.array(nodes).reshape(i + 1, j + 1)
-
+        return GridGraph(self.norm_map)
 
 def generate_path_from_trace(
     sim: Simulator, trace_path: npt.NDArray[Any], num_smoothing_points: int = 100
@@ -229,13 +341,124 @@ def generate_path_from_trace(
     return path_data_array
 
 
+@dataclass
+class FollowReport:
+    """
+    Cost of following a path, in round trips to the simulator.
+    """
+    waypoints: int = 0
+    round_trips: int = 0
+    distance: float = 0.0
+    seconds: float = 0.0
+
+    @property
+    def round_trips_per_meter(self) -> float:
+        """
+        return: the number of round trips per meter driven by the robot
+        """
+        return self.round_trips / self.distance if self.distance else float("inf")
+
+
+class PathFollower:
+    """
+    Drives the robot along a path one poll at a time, so the caller decides how to wait between polls and can
+    switch to a new path while the robot is driving.
+
+    The trackpoint is only moved when the robot reaches the current one, and its position is kept locally
+    instead of being read back, so following costs one round trip per poll plus one per waypoint.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self, sim: Simulator, trackpoint_handle: Handle, robot_handle: Handle, thresh: float = 0.1
+    ):
+        """
+        Parameters
+        ----------
+        sim : Simulator
+            Handle to the sim object.
+        trackpoint_handle : Handle
+            Handle to the trackpoint for the P3DX to travel to.
+        robot_handle : Handle
+            Handle to the actual P3DX
+        thresh : float, optional
+            How close the robot should be to the trackpoint before continuing to the next trackpoint.
+        """
+        self.sim = sim
+        self.trackpoint_handle = trackpoint_handle
+        self.robot_handle = robot_handle
+        self.thresh = thresh
+        self.report = FollowReport()
+        self.targets = np.empty((0, 7))
+        self.target_index = 0
+        self.sent_index = -1
+        self.robot_pos = np.array(sim.getObjectPosition(robot_handle, sim.handle_world))
+        self.report.round_trips += 1
+
+    def set_path(self, path_data_array: npt.NDArray[Any], join: bool = False) -> None:
+        """
+        Follows the path instead of the current one.
+
+        Parameters
+        ----------
+        path_data_array : numpy.ndarray
+            The array of positions that the robot should travel, as returned by generate_path_from_trace.
+        join : bool, optional
+            Start at the waypoint closest to the robot instead of the first one, for a path planned from where
+            the robot was a moment ago.
+        """
+        # The waypoints are followed from the last row of the path data to the first
+        self.targets = np.array(path_data_array[::-1], dtype=float)
+        self.targets[np.isnan(self.targets).any(axis=1), 3:] = [0.0, 0.0, 0.0, 1.0]
+        self.target_index = 0
+        if join and len(self.targets):
+            self.target_index = int(np.argmin(np.linalg.norm(self.targets[:, :3] - self.robot_pos, axis=1)))
+        self.sent_index = -1
+
+    def advance(self) -> bool:
+        """
+        Skips the waypoints the robot is close enough to and moves the trackpoint to the next one.
+
+        Returns
+        -------
+        bool
+            False once the robot has reached the last waypoint
+        """
+        while self.target_index < len(self.targets) and (
+            np.linalg.norm(self.robot_pos - self.targets[self.target_index, :3]) < self.thresh
+        ):
+            self.target_index += 1
+        if self.target_index == len(self.targets):
+            return False
+
+        if self.sent_index != self.target_index:
+            self.sim.setObjectPose(self.trackpoint_handle, self.sim.handle_world, list(self.targets[self.target_index]))
+            self.sent_index = self.target_index
+            self.report.waypoints += 1
+            self.report.round_trips += 1
+        return True
+
+    def read_position(self) -> None:
+        """
+        Reads the position of the robot after it has driven for a poll, and adds the distance it drove.
+        """
+        new_pos = np.array(self.sim.getObjectPosition(self.robot_handle, self.sim.handle_world))
+        self.report.round_trips += 1
+        self.report.distance += float(np.linalg.norm(new_pos - self.robot_pos))
+        self.robot_pos = new_pos
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
 def execute_path(
     path_data_array: npt.NDArray[Any],
     sim: Simulator,
     trackpoint_handle: Handle,
     robot_handle: Handle,
     thresh: float = 0.1,
-) -> None:
+    poll_period: float = 0.05,
+    stepping: bool = False,
+) -> FollowReport:
     """
     Parameters
     ----------
@@ -250,57 +473,91 @@ def execute_path(
     thresh : float, optional
         How close the robot should be to the trackpoint before
         continuing to the next trackpoint.
+    poll_period : float, optional
+        Seconds between two reads of the robot position when the simulation runs freely.
+    stepping : bool, optional
+        Run the simulation one step per read of the robot position instead, and restore the previous
+        stepping mode at the end.
+
+    The robot is driven by a PathFollower until it reaches the last waypoint.
 
     Returns
     -------
-    None.
+    FollowReport
+        The waypoints sent, the round trips made and the distance driven.
     """
-    path_index = 1
-    while path_index <= path_data_array.shape[0]:
-        # set the track point pos
-        target_point = path_data_array[-path_index, :]
-        if any(np.isnan(target_point)):
-            target_point[3:] = [0.0, 0.0, 0.0, 1.0]
-        sim.setObjectPose(
-            trackpoint_handle, sim.handle_world, list(path_data_array[-path_index, :])
-        )
-        # get the current robot position
-        robot_pos = sim.getObjectPosition(robot_handle, sim.handle_world)
-        trackpt_pos = sim.getObjectPosition(trackpoint_handle, sim.handle_world)
-        # compute the distance between the trackpt position and the robot
-        rob_trackpt_dist = np.linalg.norm(np.array(robot_pos) - np.array(trackpt_pos))
-        if rob_trackpt_dist < thresh:
-            path_index = path_index + 1
-
-
-def initialize_algorithm(start: Position) -> tuple[PriorityQueue[Node], int]:
+    begin = time.perf_counter()
+    previous_stepping = 0
+    if stepping:
+        previous_stepping = sim.setStepping(True)
+    follower = PathFollower(sim, trackpoint_handle, robot_handle, thresh)
+    follower.set_path(path_data_array)
+    report = follower.report
+    report.round_trips += int(stepping)
+
+    while follower.advance():
+        if stepping:
+            sim.step()
+            report.round_trips += 1
+        else:
+            time.sleep(poll_period)
+        follower.read_position()
+
+    if stepping:
+        sim.setStepping(bool(previous_stepping))
+        report.round_trips += 1
+    report.seconds = time.perf_counter() - begin
+    return report
+
+
+def initialize_algorithm(
+    graph: GridGraph, start: Position, use_heuristic: bool = True
+) -> tuple[OpenList, int]:
     """
     This function is used to initialize anything that is needed for all of our algorithms to run.
-    :param heuristic: the heuristic function to use for calculating the distance between two nodes
-    :param distance: the initial distance between the start node and the end node
-    :param diagonal_neighbors: whether diagonal neighbors are allowed
-    Returns: a tuple of the priority queue, the explored set, and the depth
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset
+    :param start: the start position
+    :param use_heuristic: whether the priority of the start includes its heuristic
+    Returns: a tuple of a new open list holding the start and the depth
+    """
+    open_list = OpenList()
+    index = graph.index(start)
+    graph.set_cost(index, 0, -1)
+    graph.mark_visited(index)
+    graph.f[index] = graph.heuristic(index) if use_heuristic else 0
+    open_list.push(index, graph.f[index])
+    return open_list, 0
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def open_neighbor(
+    graph: GridGraph, open_list: OpenList, index: int, cost: float, parent: int, stats: Optional[SearchStats] = None
+) -> None:
+    """
+    Opens the cell with the f-cost of reaching it from parent with the g-cost, if that is cheaper than the
+    path to it found so far. Cells that were already explored are opened again, and counted in the stats.
     """
-    queue: PriorityQueue[Node] = PriorityQueue()
-    node = Node.worldmap_reference[start[0], start[1]]
-    node.is_explored = True
-    queue.put(node)
-    return queue, 0
+    if cost < graph.cost(index):
+        if stats is not None and graph.is_visited(index):
+            stats.reopenings += 1
+        graph.set_cost(index, cost, parent)
+        graph.f[index] = cost + graph.heuristic(index)
+        open_list.push(index, graph.f[index])
 
 
-def backtrack(node: Node, start: Position) -> list[Position]:
+def backtrack(graph: GridGraph, index: int, start: Position) -> list[Position]:
     """
     This function is used to backtrack from the last node to the first node.
     Returns: a list of nodes that represents the path from the start node to the end node
     """
     path: list[Position] = []
-    curr_node: Node = node
-    while curr_node.get_coordinates() != start:
-        path.append(curr_node.get_coordinates())
-        new_node = curr_node.parent_node
-        if new_node is None:
+    start_index = graph.index(start)
+    curr_index = index
+    while curr_index != start_index:
+        path.append(graph.position(curr_index))
+        curr_index = int(graph.parent[curr_index])
+        if curr_index < 0:
             raise ValueError("Bad things have happened.")
-        curr_node = new_node
     # Reverse order
     path.reverse()
     return path
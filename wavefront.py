@@ -0,0 +1,155 @@
+"""
+This file contains the wavefront planner, which spreads the distances to the goal from the whole frontier at
+once with array operations, instead of expanding one cell at a time.
+
+It uses the weights of GridGraph, STRAIGHT_WEIGHT (1) for straight moves and DIAGONAL_WEIGHT (2) for diagonal
+moves. The distances are integers, so the cells at distance d are the free cells not reached yet that are a
+straight move away from a cell at distance d - 1 or a diagonal move away from a cell at distance d - 2. Every
+level is final once it is computed, like the buckets of Djikstra, and the distances are the same as the ones
+of Djikstra. The path follows the gradient of the distances down to the goal.
+"""
+from collections import deque
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from distance_field import DistanceField
+from grid import DIAGONAL_MOVES, DIAGONAL_WEIGHT, STRAIGHT_MOVES, STRAIGHT_WEIGHT, GridGraph
+from heuristic import manhattan_distance
+from node import Position
+from search_stats import SearchStats
+
+assert STRAIGHT_WEIGHT == 1 and DIAGONAL_WEIGHT == 2, "the levels of the wavefront need integer weights 1 and 2"
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+def wavefront(
+    graph: GridGraph,
+    goal: Position,
+    diagonal_neighbors: bool = False,
+    stop: Optional[Position] = None,
+    depth_limit: Optional[int] = None,
+    stats: Optional[SearchStats] = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Computes the distances to the goal level by level. The grid is padded with a border of obstacles, so the
+    neighbors of a level are the cell ids of the level shifted by a fixed offset per move, without bounds
+    checks, and a level costs the same whether it spans the map or a corridor.
+
+    :param graph: the grid, only its occupancy is used
+    :param goal: the goal position
+    :param diagonal_neighbors: whether diagonal neighbors are allowed
+    :param stop: a position to stop at once its distance is known, every cell is reached without it
+    :param depth_limit: the number of levels to compute at most
+    :param stats: the counters to fill in, every cell reached counts as an expansion
+    :return: flat array of the distance to the goal, infinity for the cells that were not reached
+    """
+    cols = graph.cols + 2
+    free = np.pad(graph.occupancy.reshape(graph.rows, graph.cols) == 0, 1).reshape(-1)
+    distance = np.full(free.size, np.inf)
+    straight = np.array([d_row * cols + d_col for d_row, d_col in STRAIGHT_MOVES])
+    diagonal = np.array([d_row * cols + d_col for d_row, d_col in DIAGONAL_MOVES])
+    stop_index = None if stop is None else (stop[0] + 1) * cols + stop[1] + 1
+    level = 0
+
+    # Cell ids of the levels d - 2 and d - 1 in the padded grid
+    levels: deque[npt.NDArray[np.intp]] = deque([np.empty(0, dtype=np.intp)] * 2, maxlen=2)
+    goal_index = (goal[0] + 1) * cols + goal[1] + 1
+    if free[goal_index]:
+        distance[goal_index] = 0
+        levels.append(np.array([goal_index]))
+
+    while (levels[0].size or levels[1].size) and (stop_index is None or distance[stop_index] == np.inf):
+        if depth_limit is not None and level >= depth_limit:
+            break
+        level += 1
+
+        candidates = (levels[1][:, None] + straight).reshape(-1)
+        if diagonal_neighbors and levels[0].size:
+            candidates = np.concatenate((candidates, (levels[0][:, None] + diagonal).reshape(-1)))
+        # A cell can be next to several cells of the previous levels
+        new = np.unique(candidates[free[candidates] & (distance[candidates] == np.inf)])
+        distance[new] = level
+        levels.append(new)
+
+        if stats is not None:
+            stats.expansions += new.size
+            if stats.on_expand is not None:
+                for index in new.tolist():
+                    row, col = divmod(index, cols)
+                    stats.on_expand((row - 1) * graph.cols + col - 1)
+
+    if stats is not None:
+        stats.depth = max(stats.depth, level)
+        stats.depth_limit_reached = stop_index is not None and distance[stop_index] == np.inf and (
+            bool(levels[0].size or levels[1].size)
+        )
+    return np.ascontiguousarray(distance.reshape(-1, cols)[1:-1, 1:-1]).reshape(-1)
+
+
+def successors(
+    graph: GridGraph, distance: npt.NDArray[np.float64], diagonal_neighbors: bool = False
+) -> npt.NDArray[np.int64]:
+    """
+    Follows the gradient of the distances: the successor of a cell is its first neighbor, in the order of
+    GridGraph.neighbors, whose distance is the distance of the cell minus the weight of the move.
+
+    :param graph: the grid the distances were computed on
+    :param distance: flat array of the distance to the goal, as returned by wavefront
+    :param diagonal_neighbors: whether diagonal neighbors are allowed
+    :return: flat array of the next cell towards the goal, -1 for the goal and the cells that cannot reach it
+    """
+    distance = distance.reshape(graph.rows, graph.cols)
+    indices = np.arange(graph.size).reshape(graph.rows, graph.cols)
+    successor = np.full((graph.rows, graph.cols), -1, dtype=np.int64)
+    moves = [(move, STRAIGHT_WEIGHT) for move in STRAIGHT_MOVES]
+    if diagonal_neighbors:
+        moves += [(move, DIAGONAL_WEIGHT) for move in DIAGONAL_MOVES]
+
+    for (d_row, d_col), weight in moves:
+        # Cells whose neighbor in the direction of the move is inside the grid, and those neighbors
+        cells = np.s_[max(-d_row, 0):graph.rows + min(-d_row, 0), max(-d_col, 0):graph.cols + min(-d_col, 0)]
+        neighbors = np.s_[max(d_row, 0):graph.rows + min(d_row, 0), max(d_col, 0):graph.cols + min(d_col, 0)]
+        downhill = (distance[neighbors] + weight == distance[cells]) & (successor[cells] == -1)
+        successor[cells][downhill] = indices[neighbors][downhill]
+    return successor.reshape(-1)
+
+
+def wavefront_field(graph: GridGraph, goal: Position, diagonal_neighbors: bool = False) -> DistanceField:
+    """
+    The same field as distance_field.compute_distance_field, computed with the wavefront.
+
+    :param graph: the grid, its search state is reset
+    :param goal: the goal position
+    :param diagonal_neighbors: whether diagonal neighbors are allowed
+    :return: the distance field of the goal
+    """
+    graph.reset(goal, manhattan_distance, diagonal_neighbors, lazy_heuristic=True)
+    distance = wavefront(graph, graph.goal, diagonal_neighbors)
+    return DistanceField(graph, distance, successors(graph, distance, diagonal_neighbors))
+
+
+def wavefront_search(
+    graph: GridGraph, start: Position, depth_limit: int = 1000000, stats: Optional[SearchStats] = None
+) -> list[Position]:
+    """
+    :param graph: the grid to search, prepared for the goal with GridGraph.reset, the heuristic is not used
+    :param start: the start position
+    :param depth_limit: the number of levels of the wavefront, the distance from the goal it can reach
+    :param stats: the counters to fill in, the search is not instrumented without them
+    Returns: a list of nodes that represents the path from the start node to the end node
+    """
+    distance = wavefront(graph, graph.goal, graph.diagonal_neighbors, start, depth_limit, stats)
+    index = graph.index(start)
+    if distance[index] == np.inf:
+        return []
+
+    # Gradient descent, one of the neighbors of every reached cell is one move closer to the goal
+    path: list[Position] = []
+    while index != graph.goal_index:
+        index = next(
+            neighbor for neighbor, weight in graph.neighbors(index) if distance[neighbor] + weight == distance[index]
+        )
+        path.append(graph.position(index))
+    return path